@@ -0,0 +1,175 @@
+"""
+Vectorized analytics over the expense history with NumPy.
+
+The history is loaded once as three columns (days since 1970-01-01, an
+int32 category code and the amount), either from SQLite in fetchmany chunks
+or from an exporter snapshot, and every derived figure is computed with
+array operations on those columns instead of per-row Python loops or extra
+SQL queries.
+"""
+
+from dataclasses import dataclass, field, replace
+from datetime import date
+
+import numpy as np
+
+from repository import BATCH_SIZE, UNIX_EPOCH_JULIAN_DAY
+
+# 1970-01-01 was a Thursday; adding this makes (day + offset) % 7 == 0 on Mondays
+WEEKDAY_OFFSET = 3
+WEEKDAY_NAMES = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+PERCENTILES = (50, 90, 99)
+
+
+@dataclass(frozen=True, eq=False)
+class ExpenseColumns:
+    """The expense history as parallel arrays, oldest first."""
+
+    # Days since 1970-01-01
+    days: np.ndarray
+    # Index into category_names
+    category: np.ndarray
+    category_names: tuple
+    amount: np.ndarray
+
+    def __len__(self):
+        return len(self.days)
+
+
+@dataclass(frozen=True, eq=False)
+class Analytics:
+    """Derived figures for a set of ExpenseColumns."""
+
+    first_day: date = None
+    last_day: date = None
+    # Spend per calendar day from first_day to last_day, and its trailing sums
+    daily_totals: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    rolling_7: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    rolling_30: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    daily_average: float = 0.0
+    # Monday first
+    weekday_totals: tuple = (0.0,) * 7
+    weekday_counts: tuple = (0,) * 7
+    # (percent, amount) over individual expenses
+    percentiles: tuple = ()
+    # (YYYY-MM, total, days in month, daily average, % change from the
+    # previous month or None), newest first, including months with no spending
+    monthly: tuple = ()
+
+    @property
+    def last_7_days(self):
+        return float(self.rolling_7[-1]) if len(self.rolling_7) else 0.0
+
+    @property
+    def last_30_days(self):
+        return float(self.rolling_30[-1]) if len(self.rolling_30) else 0.0
+
+
+def load_columns(repo, chunk_size=BATCH_SIZE):
+    """Read date, category and amount for every expense into ExpenseColumns."""
+    if repo.storage.compact:
+        day = "day"
+    else:
+        day = f"CAST(julianday(date) - {UNIX_EPOCH_JULIAN_DAY} AS INTEGER)"
+    names = {}
+    days, codes, amounts = [], [], []
+    for rows in repo.iter_expenses(chunk_size=chunk_size, columns=f"{day}, category, amount"):
+        chunk_days, categories, chunk_amounts = zip(*rows)
+        # Unparseable dates come back as NULL and are dropped below
+        days.append(np.array(chunk_days, dtype=np.float64))
+        codes.append(np.array([names.setdefault(c, len(names)) for c in categories], dtype=np.int32))
+        amounts.append(np.array(chunk_amounts, dtype=np.float64))
+    if not days:
+        return ExpenseColumns(np.zeros(0, np.int64), np.zeros(0, np.int32), (), np.zeros(0))
+
+    days = np.concatenate(days)
+    valid = ~np.isnan(days)
+    return ExpenseColumns(
+        days=days[valid].astype(np.int64),
+        category=np.concatenate(codes)[valid],
+        category_names=tuple(names),
+        amount=np.concatenate(amounts)[valid],
+    )
+
+
+def columns_from_snapshot(path):
+    """Build ExpenseColumns from an exporter snapshot without touching SQLite."""
+    from exporter import load_snapshot
+
+    snapshot = load_snapshot(path)
+    return ExpenseColumns(
+        days=snapshot["date"].astype(np.int64),
+        category=snapshot["category"],
+        category_names=tuple(snapshot["category_names"].tolist()),
+        amount=snapshot["amount"],
+    )
+
+
+def rolling_sum(values, window):
+    """Trailing window sums: result[i] = values[i - window + 1 : i + 1].sum()."""
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+    starts = np.maximum(np.arange(1, len(values) + 1) - window, 0)
+    return cumulative[1:] - cumulative[starts]
+
+
+def compute_analytics(columns, today=None):
+    """Compute Analytics for columns.
+
+    The daily series runs to today (or the last expense, if later), so the
+    rolling windows reflect recent days without spending.
+    """
+    if not len(columns):
+        return Analytics()
+
+    days, amount = columns.days, columns.amount
+    first = int(days.min())
+    today = np.datetime64(today or date.today(), "D").astype(np.int64)
+    last = max(int(days.max()), int(today))
+
+    daily = np.bincount(days - first, weights=amount, minlength=last - first + 1)
+
+    weekdays = (days + WEEKDAY_OFFSET) % 7
+    weekday_totals = np.bincount(weekdays, weights=amount, minlength=7)
+    weekday_counts = np.bincount(weekdays, minlength=7)
+
+    # Months since 1970-01 for each expense
+    months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    first_month = int(months.min())
+    month_range = np.arange(first_month, int(months.max()) + 1)
+    month_totals = np.bincount(months - first_month, weights=amount, minlength=len(month_range))
+    starts = month_range.astype("datetime64[M]")
+    month_days = ((starts + 1).astype("datetime64[D]") - starts.astype("datetime64[D]")).astype(np.int64)
+    previous = month_totals[:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        changes = np.where(previous > 0, (month_totals[1:] - previous) / previous * 100, np.nan)
+    changes = np.concatenate(([np.nan], changes))
+
+    monthly = tuple(
+        (str(start), float(total), int(length), float(total / length),
+         None if np.isnan(change) else float(change))
+        for start, total, length, change in zip(starts, month_totals, month_days, changes)
+    )[::-1]
+
+    return Analytics(
+        first_day=np.datetime64(first, "D").item(),
+        last_day=np.datetime64(last, "D").item(),
+        daily_totals=daily,
+        rolling_7=rolling_sum(daily, 7),
+        rolling_30=rolling_sum(daily, 30),
+        daily_average=float(amount.sum() / len(daily)),
+        weekday_totals=tuple(weekday_totals.tolist()),
+        weekday_counts=tuple(weekday_counts.tolist()),
+        percentiles=tuple(zip(PERCENTILES, np.percentile(amount, PERCENTILES).tolist())),
+        monthly=monthly,
+    )
+
+
+def load_analytics(repo):
+    """Return compute_analytics() over the whole history; this reads every expense."""
+    return compute_analytics(load_columns(repo))
+
+
+def load_dashboard(repo):
+    """Return repo.get_dashboard_snapshot() with its analytics attached."""
+    snapshot = repo.get_dashboard_snapshot()
+    return replace(snapshot, analytics=load_analytics(repo))
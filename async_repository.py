@@ -0,0 +1,212 @@
+"""Background executor that keeps SQLite work off the Tk mainloop."""
+
+import queue
+import threading
+from tkinter import messagebox
+
+import instrumentation
+from repository import ExpenseRepository
+
+
+class AsyncRepository:
+    """Runs ExpenseRepository calls on a dedicated worker thread.
+
+    Results are handed back to the Tk thread by polling with after(), so
+    callbacks may touch widgets freely. Requests submitted with the same key
+    supersede each other: a queued request that has been superseded is
+    skipped, and only the newest result for a key is delivered.
+    """
+
+    # Result polling interval while work is pending (one frame at 60fps)
+    POLL_MS = 16
+
+    # Repository methods that change data; write listeners hear about each one
+    WRITE_METHODS = frozenset({
+        "insert", "update", "delete", "insert_many", "update_many", "delete_many", "rebuild_summaries",
+    })
+
+    def __init__(self, widget, repo):
+        self.widget = widget
+        self.repo = repo
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._generations = {}
+        self._pending = 0
+        self._busy = 0
+        self._poll_id = None
+        self._busy_listeners = []
+        self._write_listeners = []
+        self._jobs = []
+        self._worker = threading.Thread(target=self._run, name="expense-db", daemon=True)
+        self._worker.start()
+
+    def submit(self, func, *args, callback=None, error_callback=None, key=None, background=False, **kwargs):
+        """Queue a repository call.
+
+        func is either the name of an ExpenseRepository method or a callable
+        that receives the repository as its first argument. callback gets the
+        result on the Tk thread; error_callback gets the exception (by default
+        it is shown in a message box). background requests do not count as
+        busy for the loading indicator.
+        """
+        generation = None
+        if key is not None:
+            generation = self._generations[key] = self._generations.get(key, 0) + 1
+        self._requests.put((func, args, kwargs, callback, error_callback, key, generation, background,
+                            instrumentation.clock()))
+        self._set_pending(self._pending + 1, 0 if background else 1)
+
+    def start_job(self, func, *args, callback=None, error_callback=None, **kwargs):
+        """Run func on its own thread and connection; see BackgroundJob. Returns the job."""
+        self._jobs = [job for job in self._jobs if job.running]
+        job = BackgroundJob(self.widget, self.repo.db_name, func, *args, callback=callback,
+                            error_callback=error_callback or self._show_error, **kwargs)
+        self._jobs.append(job)
+        return job
+
+    def cancel(self, key):
+        """Drop every queued or running request submitted under key."""
+        if key in self._generations:
+            self._generations[key] += 1
+
+    def add_busy_listener(self, listener):
+        """Call listener(busy) whenever the executor starts or stops having work in flight."""
+        self._busy_listeners.append(listener)
+
+    def remove_busy_listener(self, listener):
+        if listener in self._busy_listeners:
+            self._busy_listeners.remove(listener)
+
+    def add_write_listener(self, listener):
+        """Call listener() on the Tk thread after each successful WRITE_METHODS call."""
+        self._write_listeners.append(listener)
+
+    def close(self):
+        """Stop the worker thread after the requests already queued have run, and cancel running jobs."""
+        for job in self._jobs:
+            job.stop()
+        self._requests.put(None)
+        self._worker.join()
+        if self._poll_id is not None:
+            self.widget.after_cancel(self._poll_id)
+            self._poll_id = None
+
+    def _is_current(self, key, generation):
+        return key is None or self._generations.get(key) == generation
+
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                break
+            func, args, kwargs, callback, error_callback, key, generation, background, queued = request
+            # Time spent behind other requests for the single worker connection
+            instrumentation.record_since("AsyncRepository.queue_wait", queued)
+            result = error = None
+            if self._is_current(key, generation):
+                try:
+                    if isinstance(func, str):
+                        result = getattr(self.repo, func)(*args, **kwargs)
+                    else:
+                        result = func(self.repo, *args, **kwargs)
+                except Exception as e:
+                    error = e
+            self._results.put((func, result, error, callback, error_callback, key, generation, background))
+
+    def _poll(self):
+        self._poll_id = None
+        try:
+            while True:
+                try:
+                    func, result, error, callback, error_callback, key, generation, background = \
+                        self._results.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    if error is None and func in self.WRITE_METHODS:
+                        for listener in list(self._write_listeners):
+                            listener()
+                    if not self._is_current(key, generation):
+                        continue
+                    if error is not None:
+                        (error_callback or self._show_error)(error)
+                    elif callback is not None:
+                        callback(result)
+                finally:
+                    self._set_pending(self._pending - 1, 0 if background else -1)
+        finally:
+            if self._pending and self._poll_id is None:
+                self._poll_id = self.widget.after(self.POLL_MS, self._poll)
+
+    def _set_pending(self, pending, busy_change):
+        was_busy = self._busy > 0
+        self._pending = pending
+        self._busy += busy_change
+        if pending and self._poll_id is None:
+            self._poll_id = self.widget.after(self.POLL_MS, self._poll)
+        if was_busy != (self._busy > 0):
+            for listener in list(self._busy_listeners):
+                listener(self._busy > 0)
+
+    def _show_error(self, error):
+        messagebox.showerror("Database error", str(error))
+
+
+class BackgroundJob:
+    """Runs one long function, such as an import or export, on its own thread and connection.
+
+    On the AsyncRepository worker it would hold up every page, search and
+    save queued behind it. func(repo, *args, cancelled=event, **kwargs)
+    gets its own ExpenseRepository and should return soon after the
+    threading.Event cancelled is set. callback(result) or
+    error_callback(error) is then called on the Tk thread, via widget.
+    """
+
+    POLL_MS = 100
+
+    def __init__(self, widget, db_name, func, *args, callback=None, error_callback=None, **kwargs):
+        self.widget = widget
+        self.cancelled = threading.Event()
+        self._callback = callback
+        self._error_callback = error_callback
+        self._outcome = queue.Queue()
+        self._thread = threading.Thread(target=self._run, args=(db_name, func, args, kwargs),
+                                        name="expense-job", daemon=True)
+        self._thread.start()
+        self._poll_id = widget.after(self.POLL_MS, self._poll)
+
+    @property
+    def running(self):
+        return self._thread.is_alive() or self._poll_id is not None
+
+    def cancel(self):
+        """Ask func to stop; its callback still runs with whatever it returns."""
+        self.cancelled.set()
+
+    def stop(self):
+        """Cancel, wait for func to return, and drop its callbacks; for shutting down."""
+        self.cancel()
+        self._thread.join()
+        if self._poll_id is not None:
+            self.widget.after_cancel(self._poll_id)
+            self._poll_id = None
+
+    def _run(self, db_name, func, args, kwargs):
+        try:
+            with ExpenseRepository(db_name) as repo:
+                self._outcome.put((func(repo, *args, cancelled=self.cancelled, **kwargs), None))
+        except Exception as e:
+            self._outcome.put((None, e))
+
+    def _poll(self):
+        try:
+            result, error = self._outcome.get_nowait()
+        except queue.Empty:
+            self._poll_id = self.widget.after(self.POLL_MS, self._poll)
+            return
+        self._poll_id = None
+        if error is not None:
+            if self._error_callback is not None:
+                self._error_callback(error)
+        elif self._callback is not None:
+            self._callback(result)
@@ -0,0 +1,253 @@
+"""
+Autocomplete for the expense form.
+
+Past values of each field are kept in a PrefixIndex: a sorted list of
+case-folded keys, so the values starting with a prefix are one bisect
+range, with the most used few of each range cached per prefix. The
+indexes are loaded once from the repository's value counts and updated
+as expenses are saved, so a keystroke never touches the database.
+"""
+
+import bisect
+import heapq
+import tkinter as tk
+
+import instrumentation
+from repository import split_tags
+
+# Offered even before the database has any expenses
+DEFAULT_CATEGORIES = ("Food", "Transport", "Shopping", "Entertainment", "Rent", "Other")
+DEFAULT_PAYMENT_METHODS = ("Cash", "Credit Card", "Debit Card", "Other")
+
+SUGGESTION_LIMIT = 8
+# Sorts after every character, closing the bisect range of a prefix
+_MAX_CHAR = "\U0010ffff"
+
+
+class PrefixIndex:
+    """Case-insensitive prefix lookup over values, most used first."""
+
+    def __init__(self, counts=()):
+        self._counts = {}
+        # The most used spelling of each key, with its count
+        self._values = {}
+        for value, count in counts:
+            value = value.strip()
+            if not value:
+                continue
+            key = value.casefold()
+            self._counts[key] = self._counts.get(key, 0) + count
+            if key not in self._values or count > self._values[key][1]:
+                self._values[key] = (value, count)
+        self._keys = sorted(self._counts)
+        # Prefix -> its SUGGESTION_LIMIT most used keys. One-letter prefixes
+        # have the widest ranges, so they are ranked up front.
+        self._cache = {}
+        for letter in {key[:1] for key in self._keys}:
+            self._ranked(letter)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, value, count=1):
+        """Count count more uses of value."""
+        value = value.strip()
+        if not value:
+            return
+        key = value.casefold()
+        if key in self._counts:
+            self._counts[key] += count
+        else:
+            bisect.insort(self._keys, key)
+            self._counts[key] = count
+            self._values[key] = (value, count)
+        # A count only went up, so key can only climb in its prefixes' rankings
+        for end in range(len(key) + 1):
+            ranked = self._cache.get(key[:end])
+            if ranked is not None and key not in ranked:
+                ranked = ranked + [key]
+            if ranked is not None:
+                self._cache[key[:end]] = sorted(ranked, key=self._rank_key)[:SUGGESTION_LIMIT]
+
+    def discard(self, value, count=1):
+        """Count count fewer uses of value, forgetting it once none are left."""
+        key = value.strip().casefold()
+        if key not in self._counts:
+            return
+        self._counts[key] -= count
+        if self._counts[key] <= 0:
+            del self._keys[bisect.bisect_left(self._keys, key)]
+            del self._counts[key]
+            del self._values[key]
+        # Something outside a ranking may now outrank key, so re-rank those prefixes on demand
+        for end in range(len(key) + 1):
+            self._cache.pop(key[:end], None)
+
+    @instrumentation.timed("PrefixIndex.suggest")
+    def suggest(self, prefix, limit=SUGGESTION_LIMIT):
+        """Return up to limit values starting with prefix (any case), most used first."""
+        key = prefix.casefold()
+        if limit == SUGGESTION_LIMIT:
+            keys = self._ranked(key)
+        else:
+            keys = heapq.nlargest(limit, self._range(key), key=self._counts.get)
+        return [self._values[k][0] for k in keys]
+
+    def most_common(self, limit=None):
+        """Return every value (or the first limit), most used first."""
+        keys = sorted(self._keys, key=self._counts.get, reverse=True)
+        return [self._values[k][0] for k in keys[:limit]]
+
+    def _range(self, key):
+        lo = bisect.bisect_left(self._keys, key)
+        return self._keys[lo:bisect.bisect_left(self._keys, key + _MAX_CHAR, lo)]
+
+    def _ranked(self, key):
+        ranked = self._cache.get(key)
+        if ranked is None:
+            # nlargest is stable, so ties keep the alphabetical order of the range
+            ranked = self._cache[key] = heapq.nlargest(SUGGESTION_LIMIT, self._range(key), key=self._counts.get)
+        return ranked
+
+    def _rank_key(self, key):
+        return -self._counts[key], key
+
+
+class ExpenseSuggestions:
+    """Prefix indexes for the autocompleted fields of the expense form."""
+
+    def __init__(self, value_counts=None):
+        value_counts = value_counts or {}
+        self.category = PrefixIndex(value_counts.get("category", ()))
+        self.payment_method = PrefixIndex(value_counts.get("payment_method", ()))
+        self.description = PrefixIndex(value_counts.get("description", ()))
+        self.tags = PrefixIndex(value_counts.get("tags", ()))
+        for value in DEFAULT_CATEGORIES:
+            self.category.add(value, 0)
+        for value in DEFAULT_PAYMENT_METHODS:
+            self.payment_method.add(value, 0)
+
+    @classmethod
+    def load(cls, repo):
+        """Build the indexes from repo's value counts; runs on the AsyncRepository worker."""
+        return cls(repo.get_value_counts())
+
+    def add_expense(self, row):
+        """Count the values of a saved (id, date, category, description, amount, payment, comments, tags) row."""
+        self._update(row, 1)
+
+    def remove_expense(self, row):
+        """Stop counting the values of a row that was edited or deleted."""
+        self._update(row, -1)
+
+    def _update(self, row, delta):
+        _, _, category, description, _, payment, *rest = row
+        tags = rest[1] if len(rest) > 1 else None
+        pairs = [(self.category, category), (self.description, description), (self.payment_method, payment)]
+        pairs += [(self.tags, tag) for tag in split_tags(tags)]
+        for index, value in pairs:
+            if not value:
+                continue
+            if delta > 0:
+                index.add(value, delta)
+            else:
+                index.discard(value, -delta)
+
+
+class SuggestionPopup:
+    """List of suggestions shown under an Entry, Combobox or Text while typing.
+
+    get_prefix() returns the text being completed and accept(value) puts a
+    chosen suggestion in place. Up/Down move through the list, Return or Tab
+    accepts, Escape closes it.
+    """
+
+    # Keys that move around or accept rather than change the text
+    IGNORED_KEYS = frozenset({
+        "Up", "Down", "Left", "Right", "Return", "Tab", "Escape", "Home", "End", "Prior", "Next",
+        "Shift_L", "Shift_R", "Control_L", "Control_R", "Alt_L", "Alt_R",
+    })
+    # Hiding on focus-out waits this long so a click on the list still lands
+    HIDE_DELAY_MS = 200
+
+    def __init__(self, widget, index, get_prefix, accept):
+        self.widget = widget
+        self.index = index
+        self.get_prefix = get_prefix
+        self.accept = accept
+        self.popup = None
+        self.listbox = None
+
+        widget.bind("<KeyRelease>", self._on_key_release, add="+")
+        widget.bind("<Down>", lambda event: self._move(1), add="+")
+        widget.bind("<Up>", lambda event: self._move(-1), add="+")
+        widget.bind("<Return>", self._on_accept_key, add="+")
+        widget.bind("<Tab>", self._on_accept_key, add="+")
+        widget.bind("<Escape>", lambda event: self.hide(), add="+")
+        widget.bind("<FocusOut>", lambda event: widget.after(self.HIDE_DELAY_MS, self.hide), add="+")
+
+    def _on_key_release(self, event):
+        if event.keysym not in self.IGNORED_KEYS:
+            self.refresh()
+
+    def refresh(self):
+        prefix = self.get_prefix()
+        values = self.index.suggest(prefix) if prefix.strip() else []
+        if not values or values == [prefix]:
+            self.hide()
+            return
+        self._show(values)
+
+    def _show(self, values):
+        if self.popup is None:
+            self.popup = tk.Toplevel(self.widget)
+            self.popup.overrideredirect(True)
+            self.listbox = tk.Listbox(self.popup, height=SUGGESTION_LIMIT, takefocus=0, exportselection=False)
+            self.listbox.pack(fill="both", expand=True)
+            self.listbox.bind("<ButtonPress-1>", self._on_click)
+        self.listbox.delete(0, "end")
+        self.listbox.insert("end", *values)
+        self.listbox.config(height=len(values), width=max(max(len(value) for value in values), 20))
+        x = self.widget.winfo_rootx()
+        y = self.widget.winfo_rooty() + self.widget.winfo_height()
+        self.popup.geometry(f"+{x}+{y}")
+        self.popup.deiconify()
+        self.popup.lift()
+
+    def hide(self):
+        if self.popup is not None and self.popup.winfo_exists():
+            self.popup.withdraw()
+
+    def _visible(self):
+        return self.popup is not None and self.popup.winfo_exists() and self.popup.winfo_viewable()
+
+    def _move(self, step):
+        if not self._visible():
+            return None
+        selected = self.listbox.curselection()
+        position = (selected[0] + step if selected else 0 if step > 0 else self.listbox.size() - 1)
+        position = max(0, min(position, self.listbox.size() - 1))
+        self.listbox.selection_clear(0, "end")
+        self.listbox.selection_set(position)
+        self.listbox.see(position)
+        return "break"
+
+    def _on_accept_key(self, event):
+        if not self._visible():
+            return None
+        selected = self.listbox.curselection()
+        if not selected:
+            if event.keysym == "Return":
+                return None
+            selected = (0,)
+        self._choose(self.listbox.get(selected[0]))
+        return "break"
+
+    def _on_click(self, event):
+        self._choose(self.listbox.get(self.listbox.nearest(event.y)))
+        self.widget.focus_set()
+        return "break"
+
+    def _choose(self, value):
+        self.hide()
+        self.accept(value)
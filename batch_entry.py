@@ -0,0 +1,201 @@
+"""Spreadsheet-style window for entering many expenses in one go."""
+
+import tkinter as tk
+from tkinter import messagebox
+from datetime import datetime
+
+from autocomplete import ExpenseSuggestions, SuggestionPopup
+from validation import DATE_FORMAT, validate_expense
+
+# (field, heading, width in characters), in insert_many column order
+COLUMNS = (
+    ("date", "Date", 11),
+    ("category", "Category", 14),
+    ("description", "Description", 28),
+    ("amount", "Amount", 9),
+    ("payment_method", "Payment", 12),
+    ("user_comments", "Comments", 20),
+    ("tags", "Tags", 18),
+)
+# New rows start with these values from the row above, since receipts come in runs
+CARRIED_OVER = ("date", "payment_method")
+# Only rows with one of these filled in are saved
+CONTENT_FIELDS = ("category", "description", "amount", "user_comments", "tags")
+ERROR_BACKGROUND = "#ffd6d6"
+
+
+def save_rows(repo, rows):
+    """Insert rows in one transaction and return them as stored; runs on the AsyncRepository worker."""
+    return [repo.get_by_id(expense_id) for expense_id in repo.insert_many(rows)]
+
+
+class BatchEntryWindow(tk.Toplevel):
+    """Grid of expense rows validated together and saved with a single insert_many.
+
+    Tab and Shift+Tab move between cells, Return moves down a column
+    (adding a row at the bottom) and Ctrl+Return saves. Nothing is written
+    until every filled-in row passes the same checks as the expense form.
+    on_save is called once with all the saved rows as the repository
+    returns them.
+    """
+
+    INITIAL_ROWS = 10
+
+    def __init__(self, master, db, on_save, suggestions=None):
+        super().__init__(master)
+        self.title("Batch Entry")
+        self.geometry("980x420")
+        self.db = db
+        self.on_save = on_save
+        self.suggestions = suggestions or ExpenseSuggestions()
+        # One {field: Entry} dict per grid row
+        self.rows = []
+
+        self._build_widgets()
+        for _ in range(self.INITIAL_ROWS):
+            self._add_row()
+        self._default_background = self.rows[0]["date"].cget("background")
+        self.rows[0]["category"].focus_set()
+
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+
+    def _build_widgets(self):
+        container = tk.Frame(self)
+        container.pack(fill="both", expand=True, padx=5, pady=5)
+        self.canvas = tk.Canvas(container, highlightthickness=0)
+        scrollbar = tk.Scrollbar(container, orient="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+
+        self.grid_frame = tk.Frame(self.canvas)
+        self.canvas.create_window((0, 0), window=self.grid_frame, anchor="nw")
+        self.grid_frame.bind("<Configure>",
+                             lambda event: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
+        for column, (_, heading, _) in enumerate(COLUMNS):
+            tk.Label(self.grid_frame, text=heading, anchor="w").grid(row=0, column=column, sticky="w", padx=1)
+
+        bottom = tk.Frame(self)
+        bottom.pack(fill="x", padx=5, pady=5)
+        self.status_var = tk.StringVar(value="Return: next row · Ctrl+Return: save all")
+        tk.Label(bottom, textvariable=self.status_var, anchor="w").pack(side="left", fill="x", expand=True)
+        tk.Button(bottom, text="Cancel", command=self._on_close).pack(side="right", padx=3)
+        self.save_button = tk.Button(bottom, text="Save All", command=self._on_save)
+        self.save_button.pack(side="right", padx=3)
+        tk.Button(bottom, text="Add Row", command=self._add_row).pack(side="right", padx=3)
+
+    def _add_row(self):
+        previous = self.rows[-1] if self.rows else None
+        row = {}
+        for column, (field, _, width) in enumerate(COLUMNS):
+            entry = tk.Entry(self.grid_frame, width=width)
+            entry.grid(row=len(self.rows) + 1, column=column, padx=1, pady=1)
+            row[field] = entry
+        # The suggestion popups bind Return first, so accepting a suggestion does not also move down
+        self._add_autocomplete(row)
+        for field, entry in row.items():
+            entry.bind("<Return>", lambda event, field=field: self._next_row(event.widget, field), add="+")
+            entry.bind("<FocusIn>", lambda event: self._scroll_into_view(event.widget), add="+")
+            # More specific than the Return bindings, which would otherwise swallow it
+            entry.bind("<Control-Return>", lambda event: self._on_save() or "break")
+        if previous is not None:
+            for field in CARRIED_OVER:
+                row[field].insert(0, previous[field].get())
+        else:
+            row["date"].insert(0, datetime.today().strftime(DATE_FORMAT))
+        self.rows.append(row)
+        return row
+
+    def _add_autocomplete(self, row):
+        for field, index in (("category", self.suggestions.category),
+                             ("description", self.suggestions.description),
+                             ("payment_method", self.suggestions.payment_method)):
+            entry = row[field]
+            SuggestionPopup(entry, index, entry.get, lambda value, entry=entry: self._complete(entry, value))
+        tags = row["tags"]
+        SuggestionPopup(tags, self.suggestions.tags, lambda: tags.get().rpartition(",")[2].lstrip(),
+                        lambda value: self._complete_tag(tags, value))
+
+    def _complete(self, entry, value):
+        entry.delete(0, "end")
+        entry.insert(0, value)
+
+    def _complete_tag(self, entry, value):
+        head = entry.get().rpartition(",")[0].rstrip()
+        self._complete(entry, f"{head}, {value}, " if head else f"{value}, ")
+
+    def _next_row(self, entry, field):
+        index = next(i for i, row in enumerate(self.rows) if row[field] is entry)
+        if index + 1 == len(self.rows):
+            self._add_row()
+        self.rows[index + 1][field].focus_set()
+        return "break"
+
+    def _scroll_into_view(self, entry):
+        self.canvas.update_idletasks()
+        top, bottom = entry.winfo_y(), entry.winfo_y() + entry.winfo_height()
+        height = self.grid_frame.winfo_height()
+        if not height:
+            return
+        first, last = (float(f) * height for f in self.canvas.yview())
+        if top < first or bottom > last:
+            self.canvas.yview_moveto(max(top - (last - first) / 2, 0) / height)
+
+    def _filled_rows(self):
+        """Return (row number, grid row, {field: stripped text}) for the rows with something entered."""
+        filled = []
+        for number, row in enumerate(self.rows, start=1):
+            values = {field: entry.get().strip() for field, entry in row.items()}
+            if any(values[field] for field in CONTENT_FIELDS):
+                filled.append((number, row, values))
+        return filled
+
+    def _on_save(self):
+        rows, errors = [], []
+        for number, row, values in self._filled_rows():
+            try:
+                date, amount = validate_expense(values["date"], values["category"], values["amount"])
+                background = self._default_background
+            except ValueError as e:
+                errors.append((row, f"Row {number}: {e}"))
+                background = ERROR_BACKGROUND
+                date, amount = values["date"], None
+            for entry in row.values():
+                entry.config(background=background)
+            rows.append((date, values["category"], values["description"], amount,
+                         values["payment_method"], values["user_comments"], values["tags"]))
+
+        if errors:
+            first_row, message = errors[0]
+            more = f" (and {len(errors) - 1} more rows)" if len(errors) > 1 else ""
+            self.status_var.set(message + more)
+            first_row["category"].focus_set()
+            return
+        if not rows:
+            self.status_var.set("Nothing to save")
+            return
+
+        # One transaction for the whole batch; block double submits while it runs
+        self.save_button.config(state="disabled")
+        self.status_var.set(f"Saving {len(rows)} expenses…")
+        self.db.submit(save_rows, rows, callback=self._on_saved, error_callback=self._on_save_failed)
+
+    def _on_saved(self, saved):
+        for row in saved:
+            self.suggestions.add_expense(row)
+        self.on_save(saved)
+        if self.winfo_exists():
+            self.destroy()
+
+    def _on_save_failed(self, error):
+        if not self.winfo_exists():
+            return
+        messagebox.showerror("Error", f"Could not save expenses: {error}", parent=self)
+        self.status_var.set("Nothing was saved")
+        self.save_button.config(state="normal")
+
+    def _on_close(self):
+        filled = len(self._filled_rows())
+        if filled and not messagebox.askyesno("Discard rows", f"Discard {filled} unsaved rows?", parent=self):
+            return
+        self.destroy()
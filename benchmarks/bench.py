@@ -0,0 +1,266 @@
+"""
+Benchmark harness for the repository, the main table and the dashboard.
+
+For each size, a seeded database is generated once (and cached under
+benchmarks/data/), then every case is timed: the median and minimum of
+--repeat calls after one warm-up call. ExpenseApp.refresh and
+DashboardWindow.refresh run headless with matplotlib on Agg; they need a
+display (use xvfb-run on a server) and are skipped without one.
+
+Results are written as JSON and compared with a stored baseline. A case
+that is slower than the baseline by more than --tolerance (and by more than
+NOISE_FLOOR_MS) is reported as a regression and the exit status is 1.
+
+    python benchmarks/bench.py --sizes 10000 100000 --json results.json
+    python benchmarks/bench.py --sizes 10000 100000 --update-baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from generate_data import create_database, generate_rows  # noqa: E402
+from repository import ExpenseRepository  # noqa: E402
+
+DATA_DIR = os.path.join(BENCH_DIR, "data")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_SIZES = (10_000, 100_000)
+# get_all materializes every row, so it is only timed up to this size
+GET_ALL_MAX_ROWS = 1_000_000
+# Differences smaller than this are timer noise, whatever the ratio
+NOISE_FLOOR_MS = 1.0
+
+
+def database_path(rows, seed, compact):
+    """Return the cached benchmark database for these settings, generating it if needed."""
+    layout = "-compact" if compact else ""
+    path = os.path.join(DATA_DIR, f"expenses-{rows}-seed{seed}{layout}.db")
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        print(f"🧪 Generating {rows} rows...", flush=True)
+        elapsed = create_database(path + ".tmp", rows, seed, compact=compact)
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(path + ".tmp" + suffix):
+                os.remove(path + ".tmp" + suffix)
+        os.replace(path + ".tmp", path)
+        print(f"   done in {elapsed:.1f}s")
+    return path
+
+
+def time_call(func, repeat):
+    """Return {"median_ms", "min_ms"} for func() over repeat calls, after one warm-up call."""
+    func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": statistics.median(samples), "min_ms": min(samples)}
+
+
+def repository_cases(repo, rows, seed):
+    """Return (name, callable) pairs for the repository benchmarks."""
+    import analytics
+
+    newest = repo.get_page(limit=1)[0]
+    middle = repo.get_page(limit=1, after=_middle_key(repo))[0]
+    keys = [(row[0], row[3], row[2]) for row in generate_rows(1000, seed + 1)]
+    new_rows = list(generate_rows(1000, seed + 2))
+
+    def drain(**kwargs):
+        return sum(len(chunk) for chunk in repo.iter_expenses(**kwargs))
+
+    def insert_delete():
+        row = repo.insert(*new_rows[0])
+        repo.delete(row[0])
+
+    def bulk_insert_delete():
+        repo.delete_many(repo.insert_many(new_rows))
+
+    month = middle[1][:7]
+    cases = [
+        ("get_page", lambda: repo.get_page()),
+        ("get_page_deep", lambda: repo.get_page((middle[1], middle[0]))),
+        ("get_by_id", lambda: repo.get_by_id(middle[0])),
+        ("iter_expenses_month", lambda: drain(start=f"{month}-01", end=f"{month}-31")),
+        ("iter_expenses_all", lambda: drain()),
+        ("search", lambda: repo.search("gro")),
+        ("get_expenses_by_tag", lambda: repo.get_expenses_by_tag("concerts")),
+        ("get_tag_totals", lambda: repo.get_tag_totals()),
+        ("get_existing_keys_1000", lambda: repo.get_existing_keys(keys)),
+        ("get_dashboard_snapshot", lambda: repo.get_dashboard_snapshot()),
+        ("load_dashboard_analytics", lambda: analytics.load_dashboard(repo)),
+        ("verify_summaries", lambda: repo.verify_summaries()),
+        ("update", lambda: repo.update(*newest)),
+        ("insert_delete", insert_delete),
+        ("insert_many_delete_many_1000", bulk_insert_delete),
+    ]
+    if rows <= GET_ALL_MAX_ROWS:
+        cases.insert(0, ("get_all", lambda: repo.get_all()))
+    return cases
+
+
+def _middle_key(repo):
+    conn = sqlite3.connect(repo.db_name)
+    try:
+        count = conn.execute("SELECT COUNT(*) FROM expenses").fetchone()[0]
+        return tuple(conn.execute(
+            "SELECT date, id FROM expenses ORDER BY date DESC, id DESC LIMIT 1 OFFSET ?", (count // 2,)
+        ).fetchone())
+    finally:
+        conn.close()
+
+
+def gui_cases(path):
+    """Return ([(name, callable), ...], cleanup) for the Tk benchmarks, or None without a display."""
+    import tkinter as tk
+
+    import matplotlib
+    matplotlib.use("Agg")
+
+    import main
+    from dashboard import DashboardWindow
+
+    main.ExpenseRepository = lambda: ExpenseRepository(path)
+    try:
+        app = main.ExpenseApp()
+    except tk.TclError:
+        return None
+    app.withdraw()
+    app.notifier.stop()
+
+    def wait(done):
+        while not done():
+            app.update()
+            time.sleep(0.001)
+
+    def refresh_table():
+        app.refresh()
+        wait(lambda: not app._loading)
+
+    dashboard = DashboardWindow(app, app.db)
+    dashboard.withdraw()
+    # Time the chart tab, the most expensive one to render
+    dashboard.notebook.select(dashboard.charts_frame)
+    wait(lambda: dashboard.snapshot is not None)
+
+    def refresh_dashboard():
+        dashboard.snapshot = None
+        dashboard.refresh()
+        wait(lambda: dashboard.snapshot is not None)
+        dashboard.canvas.draw()
+
+    def cleanup():
+        dashboard.destroy()
+        app.destroy()
+
+    return [("ExpenseApp.refresh", refresh_table), ("DashboardWindow.refresh", refresh_dashboard)], cleanup
+
+
+def run(sizes, seed, repeat, compact, gui=True):
+    results = {}
+    for rows in sizes:
+        path = database_path(rows, seed, compact)
+        print(f"\n📏 {rows} rows")
+        with ExpenseRepository(path) as repo:
+            cases = repository_cases(repo, rows, seed)
+            timings = _time_cases(cases, repeat)
+        if gui:
+            tk_cases = gui_cases(path)
+            if tk_cases is None:
+                print("   ⚠️  No display; skipping the ExpenseApp/DashboardWindow cases")
+                gui = False
+            else:
+                cases, cleanup = tk_cases
+                try:
+                    timings.update(_time_cases(cases, repeat))
+                finally:
+                    cleanup()
+        results[str(rows)] = timings
+    return results
+
+
+def _time_cases(cases, repeat):
+    timings = {}
+    for name, func in cases:
+        timings[name] = time_call(func, repeat)
+        print(f"   {name:<30} {timings[name]['median_ms']:10.2f} ms", flush=True)
+    return timings
+
+
+def compare(results, baseline, tolerance):
+    """Return (size, case, baseline ms, current ms) for every regression."""
+    regressions = []
+    for size, timings in results.items():
+        for name, timing in timings.items():
+            before = baseline.get("sizes", {}).get(size, {}).get(name)
+            if before is None:
+                continue
+            now, was = timing["median_ms"], before["median_ms"]
+            if now > was * tolerance and now - was > NOISE_FLOOR_MS:
+                regressions.append((size, name, was, now))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the repository, main table and dashboard")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="row counts to benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="data generator seed")
+    parser.add_argument("--repeat", type=int, default=5, help="timed calls per case")
+    parser.add_argument("--compact", action="store_true", help="benchmark the compact storage layout")
+    parser.add_argument("--no-gui", action="store_true", help="skip the Tk benchmarks")
+    parser.add_argument("--json", dest="json_path", help="write the results to this file")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline results to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.25,
+                        help="flag cases slower than baseline times this factor")
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the baseline")
+    args = parser.parse_args()
+
+    output = {
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "layout": "compact" if args.compact else "legacy",
+        "sizes": run(args.sizes, args.seed, args.repeat, args.compact, gui=not args.no_gui),
+    }
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(output, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(output, f, indent=2)
+        print(f"\n💾 Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("\n💡 No baseline to compare against; run with --update-baseline to store one")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("layout") != output["layout"]:
+        print(f"\n⚠️  Baseline is for the {baseline.get('layout')} layout; comparing anyway")
+
+    regressions = compare(output["sizes"], baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} cases slower than the baseline (x{args.tolerance}):")
+        for size, name, was, now in regressions:
+            print(f"    {size:>8} {name:<30} {was:10.2f} -> {now:10.2f} ms ({now / was:.2f}x)")
+        sys.exit(1)
+    print("\n✅ No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Seeded synthetic expense data for benchmarks.
+
+Rows come out in date order over the requested span, with category,
+merchant, amount, payment method, tag and comment distributions loosely
+modelled on a household budget: frequent small food and transport
+purchases, occasional large shopping and rent-sized payments, and busier
+weekends. The same seed, row count and span always produce the same
+rows.
+
+    python benchmarks/generate_data.py bench.db --rows 100000 --seed 1
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import time
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from repository import ExpenseRepository, batched  # noqa: E402
+
+# category: (share of rows, median amount, lognormal sigma, merchants, tags)
+CATEGORIES = {
+    "Food": (0.38, 14.0, 0.7, ("FreshMart", "Corner Cafe", "Pizza Palace", "Sushi Bar", "Green Grocer",
+                               "Bakery Bros", "Taco Stand"),
+             ("groceries", "restaurant", "coffee", "takeout")),
+    "Transport": (0.18, 12.0, 0.8, ("City Transit", "QuickCab", "Shell", "Esso", "Bike Share"),
+                  ("commute", "fuel", "taxi", "transit")),
+    "Shopping": (0.16, 45.0, 0.9, ("MegaMart", "Book Nook", "TechHub", "Style Co", "Home Depot"),
+                 ("clothes", "electronics", "gifts", "household")),
+    "Entertainment": (0.12, 25.0, 0.7, ("Cineplex", "Steam", "Spotify", "Concert Hall", "Bowling Alley"),
+                      ("movies", "games", "concerts", "streaming")),
+    "Rent": (0.02, 1200.0, 0.1, ("Landlord", "Hydro", "Internet Co"), ("housing", "utilities")),
+    "Other": (0.14, 30.0, 1.0, ("Pharmacy", "Clinic", "Post Office", "Bookstore", "Gym"),
+              ("health", "education", "misc")),
+}
+PAYMENT_METHODS = {"Credit Card": 0.45, "Debit Card": 0.30, "Cash": 0.15, "Other": 0.10}
+COMMENTS = ("split with roommate", "reimbursable", "work trip", "birthday", "paid back later")
+# Share of rows with 0, 1 or 2 tags, and with a comment
+TAG_COUNT_SHARES = (0.4, 0.4, 0.2)
+COMMENT_SHARE = 0.05
+# Weekend days get this much more spending than weekdays
+WEEKEND_WEIGHT = 1.3
+# Rows per insert_many transaction, so the WAL stays bounded at 10M rows
+COMMIT_EVERY = 100_000
+
+DEFAULT_END = "2025-12-31"
+
+
+def generate_rows(count, seed=0, years=3, end=DEFAULT_END):
+    """Yield count insert_many rows spread over the years ending at end, oldest first."""
+    rng = np.random.default_rng(seed)
+    last = datetime.date.fromisoformat(end)
+    first = last - datetime.timedelta(days=int(365.25 * years) - 1)
+    days = [first + datetime.timedelta(days=offset) for offset in range((last - first).days + 1)]
+    weights = np.array([WEEKEND_WEIGHT if day.weekday() >= 5 else 1.0 for day in days])
+
+    names = list(CATEGORIES)
+    shares = np.array([CATEGORIES[name][0] for name in names])
+    medians = np.log([CATEGORIES[name][1] for name in names])
+    sigmas = np.array([CATEGORIES[name][2] for name in names])
+    methods = list(PAYMENT_METHODS)
+    method_shares = np.array(list(PAYMENT_METHODS.values()))
+
+    remaining, remaining_weight = count, weights.sum()
+    for day, weight in zip(days, weights):
+        # Drawing each day's count from what is left keeps the total exact
+        n = int(rng.binomial(remaining, min(weight / remaining_weight, 1.0)))
+        remaining -= n
+        remaining_weight -= weight
+        if not n:
+            continue
+        categories = rng.choice(len(names), size=n, p=shares)
+        amounts = np.round(np.exp(rng.normal(medians[categories], sigmas[categories])), 2)
+        payments = rng.choice(len(methods), size=n, p=method_shares)
+        tag_counts = rng.choice(3, size=n, p=TAG_COUNT_SHARES)
+        merchant_picks = rng.random(n)
+        tag_picks = rng.random((n, 2))
+        comment_picks = rng.random(n)
+        date = day.isoformat()
+        for i in range(n):
+            name = names[categories[i]]
+            _, _, _, merchants, tags = CATEGORIES[name]
+            row_tags = {tags[int(pick * len(tags))] for pick in tag_picks[i, :tag_counts[i]]}
+            comment = None
+            if comment_picks[i] < COMMENT_SHARE:
+                comment = COMMENTS[int(comment_picks[i] / COMMENT_SHARE * len(COMMENTS))]
+            yield (
+                date,
+                name,
+                merchants[int(merchant_picks[i] * len(merchants))],
+                max(float(amounts[i]), 0.01),
+                methods[payments[i]],
+                comment,
+                ", ".join(sorted(row_tags)) or None,
+            )
+
+
+def create_database(path, count, seed=0, years=3, compact=False, progress=None):
+    """Create a fresh database at path filled with generate_rows(); returns the elapsed seconds."""
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    start = time.perf_counter()
+    with ExpenseRepository(path) as repo:
+        if compact:
+            repo.convert_to_compact()
+        rows = generate_rows(count, seed, years)
+        if progress:
+            rows = _counted(rows, progress)
+        for chunk in batched(rows, COMMIT_EVERY):
+            repo.insert_many(chunk)
+    return time.perf_counter() - start
+
+
+def _counted(rows, progress, every=10000):
+    for number, row in enumerate(rows, start=1):
+        if number % every == 0:
+            progress(number)
+        yield row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic expense database")
+    parser.add_argument("path", help="database file to create (replaced if it exists)")
+    parser.add_argument("--rows", type=int, default=100_000, help="number of expenses (10k - 10M)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--years", type=float, default=3, help=f"years of history ending {DEFAULT_END}")
+    parser.add_argument("--compact", action="store_true", help="use the compact integer storage layout")
+    args = parser.parse_args()
+
+    elapsed = create_database(
+        args.path, args.rows, args.seed, args.years, args.compact,
+        progress=lambda count: print(f"\r🧪 {count}/{args.rows} rows", end="", flush=True),
+    )
+    print(f"\r✅ Wrote {args.rows} rows to {args.path} in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
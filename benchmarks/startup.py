@@ -0,0 +1,94 @@
+"""
+Startup benchmark: time from interpreter start to the first page of the
+expense table being shown.
+
+Each run starts a fresh interpreter in an empty working directory (so a new
+expenses.db is created), and fails the gate if the median exceeds --max-ms or
+if matplotlib was imported before the table appeared.
+
+    python benchmarks/startup.py --runs 5 --max-ms 1500 --json startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the child interpreter; prints one JSON line and exits
+CHILD_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {repo_dir!r})
+import main
+
+original = main.ExpenseApp._show_first_page
+
+def show_first_page(self, rows):
+    original(self, rows)
+    self.update_idletasks()
+    print(json.dumps({{
+        "first_table_ms": (time.perf_counter() - start) * 1000,
+        "matplotlib_loaded": "matplotlib" in sys.modules,
+    }}))
+    self.after(0, self.destroy)
+
+main.ExpenseApp._show_first_page = show_first_page
+main.WARMUP_DELAY_MS = 60 * 60 * 1000
+main.ExpenseApp().mainloop()
+"""
+
+
+def run_once():
+    with tempfile.TemporaryDirectory() as workdir:
+        result = subprocess.run(
+            [sys.executable, "-c", CHILD_SCRIPT.format(repo_dir=REPO_DIR)],
+            cwd=workdir, capture_output=True, text=True, check=True,
+        )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure time to first expense table")
+    parser.add_argument("--runs", type=int, default=5, help="number of cold starts to time")
+    parser.add_argument("--max-ms", type=float, default=None, help="fail if the median exceeds this")
+    parser.add_argument("--json", dest="json_path", help="write the results to this file")
+    args = parser.parse_args()
+
+    try:
+        samples = [run_once() for _ in range(args.runs)]
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Startup run failed (is a display available?):\n{e.stderr}")
+        sys.exit(2)
+
+    times = [sample["first_table_ms"] for sample in samples]
+    results = {
+        "runs": args.runs,
+        "median_ms": statistics.median(times),
+        "min_ms": min(times),
+        "max_ms": max(times),
+        "matplotlib_loaded": any(sample["matplotlib_loaded"] for sample in samples),
+    }
+    print(f"⏱️  Time to first table: median {results['median_ms']:.1f} ms "
+          f"(min {results['min_ms']:.1f}, max {results['max_ms']:.1f}) over {args.runs} runs")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failed = False
+    if results["matplotlib_loaded"]:
+        print("❌ matplotlib was imported before the first table was shown")
+        failed = True
+    if args.max_ms is not None and results["median_ms"] > args.max_ms:
+        print(f"❌ Median startup {results['median_ms']:.1f} ms exceeds the {args.max_ms:.1f} ms gate")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
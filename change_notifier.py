@@ -0,0 +1,58 @@
+"""Publishes data-change events so open windows refresh only when something changed."""
+
+
+class ChangeNotifier:
+    """Tells subscribers when the expenses data has changed.
+
+    Writes made through the AsyncRepository are published as soon as they
+    complete. Writes from other processes are detected by polling
+    PRAGMA data_version on the worker thread's connection, which only
+    changes when some other connection commits; the poll itself is a single
+    pragma, so idle windows never re-run their queries.
+
+    Subscribers are called as callback(external), where external is True for
+    changes made outside this application.
+    """
+
+    # How often to look for changes made by other processes
+    POLL_INTERVAL_MS = 1000
+
+    def __init__(self, widget, db, interval_ms=POLL_INTERVAL_MS):
+        self.widget = widget
+        self.db = db
+        self.interval_ms = interval_ms
+        self._subscribers = []
+        self._version = None
+        self._timer_id = None
+        db.add_write_listener(lambda: self.publish(external=False))
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def publish(self, external):
+        for callback in list(self._subscribers):
+            callback(external)
+
+    def start(self):
+        if self._timer_id is None:
+            self._poll()
+
+    def stop(self):
+        if self._timer_id is not None:
+            self.widget.after_cancel(self._timer_id)
+            self._timer_id = None
+        self.db.cancel("data_version")
+
+    def _poll(self):
+        self.db.submit("get_data_version", callback=self._on_version, key="data_version", background=True)
+        self._timer_id = self.widget.after(self.interval_ms, self._poll)
+
+    def _on_version(self, version):
+        changed = self._version is not None and version != self._version
+        self._version = version
+        if changed:
+            self.publish(external=True)
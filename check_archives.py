@@ -0,0 +1,91 @@
+"""
+Check yearly archiving against SQLite's limit on attached databases.
+Builds a throwaway database spanning more years than SQLite can attach and
+exits with status 1 if archive_years() goes past the limit, if reads fail
+once the limit is reached, or if a failed ATTACH leaves databases attached.
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+from repository import ExpenseRepository, archive_path
+
+FIRST_YEAR, LAST_YEAR = 2010, 2025
+
+
+def _attached(repo):
+    conn = repo._get_conn()
+    return [name for _, name, _ in conn.execute("PRAGMA database_list") if name.startswith("archive")]
+
+
+def run_checks(db_name):
+    """Return a list of failure messages (empty when every check passes)."""
+    failures = []
+    with ExpenseRepository(db_name) as repo:
+        repo.insert_many(
+            [(f"{year}-06-15", "Food", f"lunch {year}", 10.0 + month, "Cash", None, "food")
+             for year in range(FIRST_YEAR, LAST_YEAR + 1) for month in range(3)]
+        )
+        total = len(repo.get_all())
+        limit = repo._get_conn().getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        last_allowed = FIRST_YEAR + limit - 1
+
+        try:
+            repo.archive_years(LAST_YEAR - 3)
+            failures.append(f"archive_years({LAST_YEAR - 3}) archived more than {limit} years")
+        except ValueError:
+            if repo.archives:
+                failures.append("a refused archive_years() still moved rows")
+
+        repo.archive_years(last_allowed)
+        if len(repo.archives) != limit:
+            failures.append(f"expected {limit} archives, found {len(repo.archives)}")
+        for name, read in (("get_all", repo.get_all), ("get_top_expenses", repo.get_top_expenses),
+                           ("get_dashboard_snapshot", repo.get_dashboard_snapshot),
+                           ("get_value_counts", repo.get_value_counts)):
+            try:
+                read()
+            except sqlite3.Error as e:
+                failures.append(f"{name} failed with {limit} archives: {e}")
+        if len(repo.get_all()) != total:
+            failures.append("rows went missing while archiving")
+
+    # A missing archive file makes an ATTACH fail part-way through
+    missing = archive_path(db_name, last_allowed)
+    os.rename(missing, missing + ".away")
+    with ExpenseRepository(db_name) as repo:
+        try:
+            repo.get_all()
+            failures.append("get_all succeeded with an archive file missing")
+        except sqlite3.OperationalError:
+            if _attached(repo):
+                failures.append(f"a failed ATTACH left {_attached(repo)} attached")
+        os.rename(missing + ".away", missing)
+        try:
+            if len(repo.get_all()) != total:
+                failures.append("rows went missing after the archive file came back")
+        except sqlite3.Error as e:
+            failures.append(f"the connection stayed broken after a failed ATTACH: {e}")
+    return failures
+
+
+def main():
+    directory = tempfile.mkdtemp(prefix="check_archives-")
+    try:
+        failures = run_checks(os.path.join(directory, "expenses.db"))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if failures:
+        print("❌ Archive checks failed:")
+        for failure in failures:
+            print(f"    {failure}")
+        sys.exit(1)
+    print("✅ Archiving stays within the attached-database limit")
+
+
+if __name__ == "__main__":
+    main()
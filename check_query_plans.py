@@ -0,0 +1,31 @@
+"""
+Check that every dashboard and list query is answered from an index.
+Exits with status 1 if any query falls back to a full table scan or sort.
+"""
+
+import sys
+from repository import DB_NAME, ExpenseRepository
+
+
+def main():
+    db_name = sys.argv[1] if len(sys.argv) > 1 else DB_NAME
+
+    with ExpenseRepository(db_name) as repo:
+        for name, statements in repo.explain_query_plans().items():
+            print(f"{name}:")
+            for _, details in statements:
+                for detail in details:
+                    print(f"    {detail}")
+
+        problems = repo.find_full_scans()
+
+    if problems:
+        print("\n❌ Queries without a usable index:")
+        for name, detail in problems:
+            print(f"    {name}: {detail}")
+        sys.exit(1)
+    print("\n✅ All queries use an index")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,36 @@
 """
 dashboard window with comprehensive data visualization and modern styling.
+
+matplotlib is imported when the Analytics tab is first built, so opening the
+dashboard on the Overview tab does not pay for it.
 """
 
+import math
 import tkinter as tk
+from dataclasses import replace
 from tkinter import ttk, messagebox
-from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
-import matplotlib.dates as mdates
+
+import instrumentation
+from analytics import WEEKDAY_NAMES, load_analytics
 
 
 class DashboardWindow(tk.Toplevel):
-    """Enhanced dashboard with comprehensive expense analytics and visualizations."""
+    """Enhanced dashboard with comprehensive expense analytics and visualizations.
+
+    Refreshes only load the DashboardSnapshot, which costs the same however
+    many expenses there are. The NumPy analytics read the whole history, so
+    they are cached and only rebuilt once stale while the Overview insights
+    or the Analysis tab is showing, after changes have settled for
+    ANALYTICS_DELAY_MS.
+    """
+
+    ANALYTICS_DELAY_MS = 2000
 
-    def __init__(self, master, repo):
+    def __init__(self, master, db, notifier=None):
         super().__init__(master)
         self.title("Expense Analytics Dashboard")
-        self.repo = repo
+        self.db = db
+        self.notifier = notifier
         self.geometry("1200x800")
         self.configure(bg='#f0f0f0')
 
@@ -25,14 +38,25 @@ class DashboardWindow(tk.Toplevel):
         self.style = ttk.Style()
         self.style.theme_use('clam')
 
+        self.snapshot = None
+        self.analytics = None
+        self._analytics_stale = True
+        self._analytics_after_id = None
         self._build_ui()
         self.refresh()
+        if self.notifier is not None:
+            self.notifier.subscribe(self._on_data_changed)
 
     def _build_ui(self):
         # Main container with notebook for tabs
         main_frame = tk.Frame(self, bg='#f0f0f0')
         main_frame.pack(fill='both', expand=True, padx=10, pady=10)
 
+        # Loading indicator shown while the background queries run
+        self.status_label = tk.Label(main_frame, text="", anchor='w', bg='#f0f0f0')
+        self.status_label.pack(side='bottom', fill='x')
+        self.db.add_busy_listener(self._on_busy_changed)
+
         # Create notebook for organized tabs
         self.notebook = ttk.Notebook(main_frame)
         self.notebook.pack(fill='both', expand=True)
@@ -40,17 +64,41 @@ class DashboardWindow(tk.Toplevel):
         # Tab 1: Overview
         self.overview_frame = tk.Frame(self.notebook, bg='white')
         self.notebook.add(self.overview_frame, text="📊 Overview")
-        self._build_overview_tab()
 
         # Tab 2: Charts & Visualizations
         self.charts_frame = tk.Frame(self.notebook, bg='white')
         self.notebook.add(self.charts_frame, text="📈 Analytics")
-        self._build_charts_tab()
 
         # Tab 3: Detailed Analysis
         self.analysis_frame = tk.Frame(self.notebook, bg='white')
         self.notebook.add(self.analysis_frame, text="🔍 Analysis")
-        self._build_analysis_tab()
+
+        # Each tab is built the first time it is selected and only re-rendered
+        # while visible; new data marks hidden tabs dirty instead of redrawing them.
+        self._tabs = {
+            str(self.overview_frame): (self._build_overview_tab, self._update_overview),
+            str(self.charts_frame): (self._build_charts_tab, self._update_charts),
+            str(self.analysis_frame): (self._build_analysis_tab, self._update_analysis),
+        }
+        self._built_tabs = set()
+        self._dirty_tabs = set()
+        self._analytics_tabs = {str(self.overview_frame), str(self.analysis_frame)}
+        self.notebook.bind('<<NotebookTabChanged>>', self._on_tab_changed)
+        self._show_tab(self.notebook.select())
+
+    def _on_tab_changed(self, event):
+        self._show_tab(self.notebook.select())
+
+    def _show_tab(self, tab):
+        build, update = self._tabs[tab]
+        if tab not in self._built_tabs:
+            build()
+            self._built_tabs.add(tab)
+        if tab in self._dirty_tabs and self.snapshot is not None:
+            update(self.snapshot)
+            self._dirty_tabs.discard(tab)
+        if tab in self._analytics_tabs and self._analytics_stale:
+            self._schedule_analytics()
 
     def _build_overview_tab(self):
         # Header section
@@ -146,6 +194,9 @@ class DashboardWindow(tk.Toplevel):
         self.top_category_label.pack(pady=5)
 
     def _build_charts_tab(self):
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
+
         # Create matplotlib figure for charts
         self.fig = Figure(figsize=(12, 8), facecolor='white')
 
@@ -155,11 +206,29 @@ class DashboardWindow(tk.Toplevel):
         self.ax3 = self.fig.add_subplot(2, 2, 3)
         self.ax4 = self.fig.add_subplot(2, 2, 4)
 
-        self.fig.tight_layout(pad=3.0)
-
-        # Embed matplotlib in tkinter
+        # Titles and labels are set once; the chart artists are created on the
+        # first update and then modified in place (see _update_charts)
+        self.ax1.set_title('Spending by Category', fontweight='bold')
+        self.ax2.set_title('Top Spending Categories', fontweight='bold')
+        self.ax2.set_xlabel('Category')
+        self.ax2.set_ylabel('Amount ($)')
+        self.ax3.set_title('Monthly Spending Trend', fontweight='bold')
+        self.ax3.set_xlabel('Month')
+        self.ax3.set_ylabel('Amount ($)')
+        self.ax4.set_title('Transaction Volume by Category', fontweight='bold')
+        self.ax4.set_xlabel('Category')
+        self.ax4.set_ylabel('Number of Transactions')
+
+        self._pie = None
+        self._pie_names = None
+        self._bars = {}
+        self._trend_line = None
+        self._trend_months = None
+
+        # Embed matplotlib in tkinter; the first draw happens in _update_charts
         self.canvas = FigureCanvasTkAgg(self.fig, master=self.charts_frame)
-        self.canvas.draw()
+        # draw_idle() ends up in this draw(), so deferred redraws are timed too
+        self.canvas.draw = instrumentation.timed("DashboardWindow.canvas.draw")(self.canvas.draw)
         self.canvas.get_tk_widget().pack(fill='both', expand=True, padx=10, pady=10)
 
     def _build_analysis_tab(self):
@@ -191,34 +260,84 @@ class DashboardWindow(tk.Toplevel):
                                     font=('Courier', 10), bg='#f8f9fa')
         self.monthly_text.pack(fill='both', expand=True, padx=5, pady=5)
 
+    def _on_busy_changed(self, busy):
+        self.status_label.config(text="Loading…" if busy else "")
+
+    def _on_data_changed(self, external):
+        self.refresh()
+
+    def destroy(self):
+        if self.notifier is not None:
+            self.notifier.unsubscribe(self._on_data_changed)
+        self.db.remove_busy_listener(self._on_busy_changed)
+        self.db.cancel(self._refresh_key)
+        self.db.cancel(self._analytics_key)
+        if self._analytics_after_id is not None:
+            self.after_cancel(self._analytics_after_id)
+        super().destroy()
+
+    @property
+    def _refresh_key(self):
+        return ('dashboard', str(self))
+
+    @property
+    def _analytics_key(self):
+        return ('dashboard-analytics', str(self))
+
     def refresh(self):
+        """Load a DashboardSnapshot in the background and redraw when it arrives."""
+        self._analytics_stale = True
+        self.db.submit("get_dashboard_snapshot", callback=self._apply_snapshot, key=self._refresh_key)
+
+    def _apply_snapshot(self, snapshot):
+        # Until fresh analytics arrive, the previous ones are shown
+        self.snapshot = replace(snapshot, analytics=self.analytics)
+        self._dirty_tabs = set(self._tabs)
+        self._show_tab(self.notebook.select())
+
+    def _schedule_analytics(self):
+        if self._analytics_after_id is not None:
+            self.after_cancel(self._analytics_after_id)
+        # The first load is not delayed; later ones wait for a burst of edits to end
+        delay = self.ANALYTICS_DELAY_MS if self.analytics is not None else 0
+        self._analytics_after_id = self.after(delay, self._load_analytics)
+
+    def _load_analytics(self):
+        self._analytics_after_id = None
+        self._analytics_stale = False
+        self.db.submit(load_analytics, callback=self._apply_analytics, key=self._analytics_key, background=True)
+
+    def _apply_analytics(self, analytics):
+        self.analytics = analytics
+        if self.snapshot is not None:
+            self.snapshot = replace(self.snapshot, analytics=analytics)
+            self._dirty_tabs |= self._analytics_tabs
+            self._show_tab(self.notebook.select())
+
+    @instrumentation.timed()
+    def _update_overview(self, snapshot):
         # Update summary statistics
-        total, count, avg = self.repo.get_summary_stats()
-        self.total_label.config(text=f"${total:.2f}")
-        self.count_label.config(text=str(count))
-        self.avg_label.config(text=f"${avg:.2f}")
+        self.total_label.config(text=f"${snapshot.total:.2f}")
+        self.count_label.config(text=str(snapshot.count))
+        self.avg_label.config(text=f"${snapshot.average:.2f}")
 
         # Update top category
-        categories = self.repo.get_totals_by_category()
-        if categories:
-            top_category = categories[0][0]
+        if snapshot.categories:
+            top_category = snapshot.categories[0][0]
             self.top_category_label.config(text=top_category)
 
         # Update insights
-        self._update_insights(total, count, avg, categories)
+        self._update_insights(snapshot)
 
         # Update recent expenses
-        self._update_recent_expenses()
-
-        # Update charts
-        self._update_charts(categories)
-
-        # Update analysis
-        self._update_analysis()
+        self._update_recent_expenses(snapshot)
 
-    def _update_insights(self, total, count, avg, categories):
+    @instrumentation.timed()
+    def _update_insights(self, snapshot):
         self.insights_text.delete('1.0', 'end')
 
+        total, count, avg = snapshot.total, snapshot.count, snapshot.average
+        categories = snapshot.categories
         insights = []
 
         if total > 0:
@@ -234,127 +353,174 @@ class DashboardWindow(tk.Toplevel):
 
                 insights.append(f"🏷️  Spending spread across {len(categories)} categories")
 
+        analytics = snapshot.analytics
+        if count and analytics is not None:
+            insights.append(f"🗓️  Last 7 days: ${analytics.last_7_days:.2f} · last 30 days: "
+                            f"${analytics.last_30_days:.2f} · ${analytics.daily_average:.2f}/day overall")
+
         # Add monthly trend insight
-        monthly_data = self.repo.get_monthly_spending()
-        if len(monthly_data) >= 2:
-            current_month = monthly_data[0][1]
-            previous_month = monthly_data[1][1]
-            if previous_month > 0:
-                change = ((current_month - previous_month) / previous_month) * 100
-                if change > 0:
-                    insights.append(f"📈 Spending increased by {change:.1f}% compared to last month")
-                else:
-                    insights.append(f"📉 Spending decreased by {abs(change):.1f}% compared to last month")
+        if analytics is not None and analytics.monthly and analytics.monthly[0][4] is not None:
+            change = analytics.monthly[0][4]
+            if change > 0:
+                insights.append(f"📈 Spending increased by {change:.1f}% compared to last month")
+            else:
+                insights.append(f"📉 Spending decreased by {abs(change):.1f}% compared to last month")
 
         insights_text = '\n'.join(insights) if insights else "📝 No expenses recorded yet"
         self.insights_text.insert('1.0', insights_text)
 
-    def _update_recent_expenses(self):
+    @instrumentation.timed()
+    def _update_recent_expenses(self, snapshot):
         for row in self.recent_tree.get_children():
             self.recent_tree.delete(row)
 
-        for date, cat, desc, amount in self.repo.get_recent_expenses(15):
+        for date, cat, desc, amount in snapshot.recent_expenses:
             self.recent_tree.insert('', 'end', values=(date, cat, desc[:30] + '...' if len(desc) > 30 else desc,
                                                        f"${amount:.2f}"))
 
-    def _update_charts(self, categories):
-        # Clear all axes
-        self.ax1.clear()
-        self.ax2.clear()
-        self.ax3.clear()
-        self.ax4.clear()
+    @instrumentation.timed()
+    def _update_charts(self, snapshot):
+        categories = snapshot.category_totals
+        monthly_data = snapshot.monthly
+        cat_counts = snapshot.category_counts
 
         # Chart 1: Category Pie Chart (Top 5 + Other)
-        if categories:
-            if len(categories) > 5:
-                top_5 = categories[:5]
-                other_total = sum(cat[1] for cat in categories[5:])
-                cat_names = [cat[0] for cat in top_5] + ['Other']
-                cat_values = [cat[1] for cat in top_5] + [other_total]
-            else:
-                cat_names = [cat[0] for cat in categories]
-                cat_values = [cat[1] for cat in categories]
-
-            self.ax1.pie(cat_values, labels=cat_names, autopct='%1.1f%%', startangle=90)
-            self.ax1.set_title('Spending by Category', fontweight='bold')
+        if len(categories) > 5:
+            top_5 = categories[:5]
+            other_total = sum(cat[1] for cat in categories[5:])
+            cat_names = [cat[0] for cat in top_5] + ['Other']
+            cat_values = [cat[1] for cat in top_5] + [other_total]
+        else:
+            cat_names = [cat[0] for cat in categories]
+            cat_values = [cat[1] for cat in categories]
+        layout_changed = self._update_pie(cat_names, cat_values)
 
         # Chart 2: Category Bar Chart (Top 5)
-        if categories:
-            cat_names = [cat[0] for cat in categories[:5]]
-            cat_values = [cat[1] for cat in categories[:5]]
-
-            bars = self.ax2.bar(cat_names, cat_values, color='skyblue')
-            self.ax2.set_title('Top Spending Categories', fontweight='bold')
-            self.ax2.set_xlabel('Category')
-            self.ax2.set_ylabel('Amount ($)')
-            self.ax2.tick_params(axis='x', rotation=45)
+        layout_changed |= self._update_bars(self.ax2, [cat[0] for cat in categories[:5]],
+                                            [cat[1] for cat in categories[:5]], 'skyblue')
 
         # Chart 3: Monthly Trends (Chronological: oldest to newest)
-        monthly_data = self.repo.get_monthly_spending()
-        if monthly_data:
-            # Reverse the data to show oldest to newest (left to right)
-            monthly_data_reversed = list(reversed(monthly_data))
-            months = [m[0] for m in monthly_data_reversed]
-            values = [m[1] for m in monthly_data_reversed]
-
-            self.ax3.plot(months, values, marker='o', linewidth=2, markersize=6)
-            self.ax3.set_title('Monthly Spending Trend', fontweight='bold')
-            self.ax3.set_xlabel('Month')
-            self.ax3.set_ylabel('Amount ($)')
-            self.ax3.tick_params(axis='x', rotation=45)
+        monthly_data_reversed = list(reversed(monthly_data))
+        layout_changed |= self._update_trend([m[0] for m in monthly_data_reversed],
+                                             [m[1] for m in monthly_data_reversed])
 
         # Chart 4: Transaction Volume by Category (Top 5)
-        cat_counts = self.repo.get_category_counts()
-        if cat_counts:
-            cat_names = [cat[0] for cat in cat_counts[:5]]
-            cat_counts_values = [cat[1] for cat in cat_counts[:5]]
-
-            self.ax4.bar(cat_names, cat_counts_values, color='lightcoral')
-            self.ax4.set_title('Transaction Volume by Category', fontweight='bold')
-            self.ax4.set_xlabel('Category')
-            self.ax4.set_ylabel('Number of Transactions')
-            self.ax4.tick_params(axis='x', rotation=45)
-
-        self.fig.tight_layout(pad=2.0)
-        self.canvas.draw()
-
-    def _update_analysis(self):
+        layout_changed |= self._update_bars(self.ax4, [cat[0] for cat in cat_counts[:5]],
+                                            [cat[1] for cat in cat_counts[:5]], 'lightcoral')
+
+        # Only new tick labels or wedges can change the layout
+        if layout_changed:
+            self.fig.tight_layout(pad=2.0)
+        self.canvas.draw_idle()
+
+    @instrumentation.timed()
+    def _update_pie(self, names, values):
+        """Regenerate the pie when its categories change, otherwise re-angle the wedges.
+
+        Returns True if the pie was regenerated.
+        """
+        if names != self._pie_names:
+            self.ax1.clear()
+            self.ax1.set_title('Spending by Category', fontweight='bold')
+            self._pie = self.ax1.pie(values, labels=names, autopct='%1.1f%%', startangle=90) if names else None
+            self._pie_names = names
+            return True
+
+        if self._pie is not None:
+            # Same placement rules as Axes.pie: labels at 1.1 and percentages at 0.6 radii
+            wedges, labels, pct_texts = self._pie
+            total = sum(values)
+            theta = 90.0
+            for wedge, label, pct_text, value in zip(wedges, labels, pct_texts, values):
+                fraction = value / total if total else 0.0
+                wedge.set_theta1(theta)
+                theta += 360.0 * fraction
+                wedge.set_theta2(theta)
+                mid = math.radians((wedge.theta1 + wedge.theta2) / 2)
+                x, y = math.cos(mid), math.sin(mid)
+                label.set_position((1.1 * x, 1.1 * y))
+                label.set_horizontalalignment('left' if x > 0 else 'right')
+                pct_text.set_position((0.6 * x, 0.6 * y))
+                pct_text.set_text(f"{fraction * 100:.1f}%")
+        return False
+
+    @instrumentation.timed()
+    def _update_bars(self, ax, names, values, color):
+        """Set bar heights in place, recreating the bars only when the categories change.
+
+        Returns True if the bars were recreated.
+        """
+        old_names, bars = self._bars.get(ax, (None, None))
+        if names == old_names:
+            for bar, value in zip(bars, values):
+                bar.set_height(value)
+            ax.relim()
+            ax.autoscale_view()
+            return False
+
+        if bars is not None:
+            bars.remove()
+        positions = list(range(len(names)))
+        bars = ax.bar(positions, values, color=color)
+        ax.set_xticks(positions)
+        ax.set_xticklabels(names, rotation=45)
+        ax.relim()
+        ax.autoscale_view()
+        self._bars[ax] = (names, bars)
+        return True
+
+    @instrumentation.timed()
+    def _update_trend(self, months, values):
+        """Move the monthly trend line's data, relabelling the x axis if the months changed.
+
+        Returns True if the tick labels changed.
+        """
+        positions = list(range(len(months)))
+        if self._trend_line is None:
+            (self._trend_line,) = self.ax3.plot(positions, values, marker='o', linewidth=2, markersize=6)
+        else:
+            self._trend_line.set_data(positions, values)
+        self.ax3.relim()
+        self.ax3.autoscale_view()
+
+        if months == self._trend_months:
+            return False
+        self.ax3.set_xticks(positions)
+        self.ax3.set_xticklabels(months, rotation=45)
+        self._trend_months = months
+        return True
+
+    @instrumentation.timed()
+    def _update_analysis(self, snapshot):
         # Update category analysis
         for row in self.cat_tree.get_children():
             self.cat_tree.delete(row)
 
-        categories = self.repo.get_totals_by_category()
-        cat_counts = dict(self.repo.get_category_counts())
-
-        for category, total in categories:
-            count = cat_counts.get(category, 0)
-            avg = total / count if count > 0 else 0
+        for category, total, count, avg in snapshot.categories:
             self.cat_tree.insert('', 'end', values=(category, f"${total:.2f}", count, f"${avg:.2f}"))
 
         # Update monthly trends
         self.monthly_text.delete('1.0', 'end')
-        monthly_data = self.repo.get_monthly_spending()
 
-        if monthly_data:
-            monthly_text = "Month      | Total Spent | Daily Average\n"
+        analytics = snapshot.analytics
+        if analytics is None:
+            self.monthly_text.insert('1.0', "Loading…")
+        elif analytics.monthly:
+            monthly_text = "Month      | Total Spent | Daily Average | vs Prev\n"
+            monthly_text += "-" * 52 + "\n"
+
+            for month, total, days, daily_avg, change in analytics.monthly[:12]:  # Last 12 months
+                change_text = f"{change:+7.1f}%" if change is not None else "     N/A"
+                monthly_text += f"{month}    | ${total:10.2f} | ${daily_avg:12.2f} | {change_text}\n"
+
+            monthly_text += "\nWeekday    | Total Spent | Transactions\n"
             monthly_text += "-" * 40 + "\n"
+            for name, total, count in zip(WEEKDAY_NAMES, analytics.weekday_totals, analytics.weekday_counts):
+                monthly_text += f"{name:<10} | ${total:10.2f} | {count:12d}\n"
 
-            for month, total in monthly_data[:12]:  # Last 12 months
-                # Calculate days in month (simplified)
-                try:
-                    year, month_num = map(int, month.split('-'))
-                    if month_num == 12:
-                        next_month = datetime(year + 1, 1, 1)
-                    else:
-                        next_month = datetime(year, month_num + 1, 1)
-                    current_month = datetime(year, month_num, 1)
-                    days = (next_month - current_month).days
-                    daily_avg = total / days if days > 0 else 0
-
-                    monthly_text += f"{month} | ${total:9.2f} | ${daily_avg:9.2f}\n"
-                except:
-                    monthly_text += f"{month} | ${total:9.2f} | N/A\n"
+            percentiles = " · ".join(f"p{pct}: ${value:.2f}" for pct, value in analytics.percentiles)
+            monthly_text += f"\nExpense size percentiles: {percentiles}\n"
 
             self.monthly_text.insert('1.0', monthly_text)
         else:
-            self.monthly_text.insert('1.0', "No monthly data available")
\ No newline at end of file
+            self.monthly_text.insert('1.0', "No monthly data available")
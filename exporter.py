@@ -0,0 +1,192 @@
+"""
+Streaming export of expenses to CSV, JSON Lines or a columnar snapshot.
+
+Rows come from ExpenseRepository.iter_expenses() one fetchmany chunk at a
+time, so exporting years of history never loads the table into Python
+objects. The columnar snapshot is Parquet when pyarrow is installed and a
+NumPy .npz file otherwise; load_snapshot() reads either back as NumPy
+arrays for analytics without opening SQLite.
+
+    python exporter.py history.csv --start 2023-01-01 --category Food
+    python exporter.py snapshot --format snapshot
+"""
+
+import argparse
+import csv
+import json
+import os
+
+from repository import BATCH_SIZE, DB_NAME, EXPENSE_COLUMNS, ExpenseRepository
+
+FORMATS = ("csv", "jsonl", "parquet", "npz", "snapshot")
+COLUMNS = tuple(column.strip() for column in EXPENSE_COLUMNS.split(","))
+
+
+def snapshot_format():
+    """Return "parquet" if pyarrow is installed, otherwise "npz"."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return "npz"
+    return "parquet"
+
+
+def export_expenses(repo, path, fmt=None, start=None, end=None, category=None, chunk_size=BATCH_SIZE,
+                    progress=None, cancelled=None):
+    """Write the matching expenses to path and return (path, rows written).
+
+    fmt is one of FORMATS, guessed from the extension when omitted.
+    "snapshot" picks snapshot_format() and swaps the extension to match.
+    progress is called with the running row count after every chunk. Once
+    the threading.Event cancelled is set, the export stops after the current
+    chunk, deletes the partial file and returns (None, rows written).
+    """
+    fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower() or "csv"
+    if fmt == "snapshot":
+        fmt = snapshot_format()
+        path = os.path.splitext(path)[0] + "." + fmt
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if fmt == "parquet" and snapshot_format() != "parquet":
+        raise ValueError("Parquet export needs pyarrow (pip install pyarrow); export .npz or .csv instead")
+
+    writer = {"csv": _write_csv, "jsonl": _write_jsonl, "parquet": _write_parquet, "npz": _write_npz}[fmt]
+    count = 0
+
+    def chunks():
+        nonlocal count
+        for rows in repo.iter_expenses(start, end, category, chunk_size):
+            if cancelled is not None and cancelled.is_set():
+                return
+            yield rows
+            count += len(rows)
+            if progress:
+                progress(count)
+
+    writer(path, chunks())
+    if cancelled is not None and cancelled.is_set():
+        os.remove(path)
+        return None, count
+    return path, count
+
+
+def _write_csv(path, chunks):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for rows in chunks:
+            writer.writerows(rows)
+
+
+def _write_jsonl(path, chunks):
+    with open(path, "w", encoding="utf-8") as f:
+        for rows in chunks:
+            f.writelines(json.dumps(dict(zip(COLUMNS, row))) + "\n" for row in rows)
+
+
+def _write_parquet(path, chunks):
+    """One row group per chunk, so only a chunk is ever buffered."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("date", pa.string()),
+        ("category", pa.dictionary(pa.int32(), pa.string())),
+        ("description", pa.string()),
+        ("amount", pa.float64()),
+        ("payment_method", pa.dictionary(pa.int32(), pa.string())),
+        ("user_comments", pa.string()),
+        ("tags", pa.string()),
+    ])
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in chunks:
+            arrays = [
+                pa.array(values).dictionary_encode() if pa.types.is_dictionary(field.type)
+                else pa.array(values, type=field.type)
+                for values, field in zip(zip(*rows), schema)
+            ]
+            writer.write_table(pa.table(arrays, schema=schema))
+
+
+def _write_npz(path, chunks):
+    """Store the analytic columns as typed arrays; text columns are left to CSV/JSONL.
+
+    Categories and payment methods are stored as int32 codes into a
+    vocabulary array, so each row costs a few dozen bytes until saved.
+    """
+    import numpy as np
+
+    vocabularies = {"category": {}, "payment_method": {}}
+    parts = {"id": [], "date": [], "amount": [], "category": [], "payment_method": []}
+    for rows in chunks:
+        ids, dates, categories, _, amounts, methods, _, _ = zip(*rows)
+        parts["id"].append(np.array(ids, dtype=np.int64))
+        parts["date"].append(np.array(dates, dtype="datetime64[D]"))
+        parts["amount"].append(np.array(amounts, dtype=np.float64))
+        for name, values in (("category", categories), ("payment_method", methods)):
+            codes = vocabularies[name]
+            parts[name].append(np.array([codes.setdefault(value or "", len(codes)) for value in values],
+                                        dtype=np.int32))
+
+    arrays = {
+        "id": np.int64, "date": "datetime64[D]", "amount": np.float64,
+        "category": np.int32, "payment_method": np.int32,
+    }
+    for name, dtype in arrays.items():
+        arrays[name] = np.concatenate(parts[name]) if parts[name] else np.array([], dtype=dtype)
+    for name, codes in vocabularies.items():
+        arrays[name + "_names"] = np.array(list(codes), dtype=str)
+    np.savez(path, **arrays)
+
+
+def load_snapshot(path):
+    """Read a Parquet or .npz snapshot into a dict of NumPy arrays.
+
+    Keys: id, date (datetime64[D]), amount, category and payment_method
+    (int32 codes), plus category_names and payment_method_names.
+    """
+    import numpy as np
+
+    if path.lower().endswith(".npz"):
+        with np.load(path) as data:
+            return {name: data[name] for name in data.files}
+
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path, columns=["id", "date", "amount", "category", "payment_method"])
+    arrays = {
+        "id": table.column("id").to_numpy(),
+        "date": np.array(table.column("date").to_numpy(zero_copy_only=False), dtype="datetime64[D]"),
+        "amount": table.column("amount").to_numpy(),
+    }
+    for name in ("category", "payment_method"):
+        values = np.array([value or "" for value in table.column(name).to_pylist()], dtype=str)
+        names, codes = np.unique(values, return_inverse=True)
+        arrays[name] = codes.astype(np.int32)
+        arrays[name + "_names"] = names
+    return arrays
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export expenses to CSV, JSON Lines or a columnar snapshot")
+    parser.add_argument("path", help="output file")
+    parser.add_argument("--format", choices=FORMATS, help="output format (default: from the extension)")
+    parser.add_argument("--db", default=DB_NAME, help=f"database file (default: {DB_NAME})")
+    parser.add_argument("--start", help="first date to include (YYYY-MM-DD)")
+    parser.add_argument("--end", help="last date to include (YYYY-MM-DD)")
+    parser.add_argument("--category", help="only export this category")
+    parser.add_argument("--chunk-size", type=int, default=BATCH_SIZE, help="rows fetched at a time")
+    args = parser.parse_args()
+
+    with ExpenseRepository(args.db) as repo:
+        path, count = export_expenses(
+            repo, args.path, fmt=args.format, start=args.start, end=args.end, category=args.category,
+            chunk_size=args.chunk_size,
+            progress=lambda count: print(f"\r📤 {count} rows", end="", flush=True),
+        )
+    print(f"\r✅ Exported {count} rows to {path}")
+
+
+if __name__ == "__main__":
+    main()
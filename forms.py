@@ -4,18 +4,28 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
 
+from autocomplete import ExpenseSuggestions, SuggestionPopup
+from validation import DATE_FORMAT, validate_expense
+
 
 class ExpenseForm(tk.Toplevel):
-    """Form window for adding or editing an expense."""
+    """Form window for adding or editing an expense.
+
+    db is the AsyncRepository the save runs on; on_save is called with the
+    saved row as returned by the repository. suggestions is the app's
+    ExpenseSuggestions, used for autocomplete and updated on save.
+    """
 
-    def __init__(self, master, repo, on_save, expense=None):
+    def __init__(self, master, db, on_save, expense=None, suggestions=None):
         super().__init__(master)
         self.title("Expense Form")
-        self.repo = repo
+        self.db = db
         self.on_save = on_save
         self.expense = expense
+        self.suggestions = suggestions or ExpenseSuggestions()
 
         self._build_widgets()
+        self._add_autocomplete()
         self._populate_fields()
 
         self.grab_set()
@@ -38,10 +48,9 @@ class ExpenseForm(tk.Toplevel):
         self.payment_var = tk.StringVar()
         self.tags_var = tk.StringVar()
 
-        # Category options
-        category_options = ["Food", "Transport", "Shopping", "Entertainment", "Rent", "Other"]
-        # Payment method options
-        payment_options = ["Cash", "Credit Card", "Debit Card", "Other"]
+        # Most used first, so the usual choices top the drop-downs
+        category_options = self.suggestions.category.most_common()
+        payment_options = self.suggestions.payment_method.most_common()
 
         tk.Entry(self, textvariable=self.date_var).grid(row=0, column=1, padx=5, pady=5)
         
@@ -61,14 +70,40 @@ class ExpenseForm(tk.Toplevel):
         self.comments_text = tk.Text(self, width=30, height=3)
         self.comments_text.grid(row=5, column=1, padx=5, pady=5)
 
-        tk.Entry(self, textvariable=self.tags_var).grid(row=6, column=1, padx=5, pady=5)
+        self.tags_entry = tk.Entry(self, textvariable=self.tags_var)
+        self.tags_entry.grid(row=6, column=1, padx=5, pady=5)
 
         btn_frame = tk.Frame(self)
         btn_frame.grid(row=7, column=0, columnspan=2, pady=10)
 
-        tk.Button(btn_frame, text="Save", command=self._on_save).pack(side="left", padx=5)
+        self.save_button = tk.Button(btn_frame, text="Save", command=self._on_save)
+        self.save_button.pack(side="left", padx=5)
         tk.Button(btn_frame, text="Cancel", command=self.destroy).pack(side="left", padx=5)
 
+    def _add_autocomplete(self):
+        for widget, var, index in ((self.category_combo, self.category_var, self.suggestions.category),
+                                   (self.payment_combo, self.payment_var, self.suggestions.payment_method)):
+            SuggestionPopup(widget, index, var.get,
+                            lambda value, widget=widget, var=var: self._complete_entry(widget, var, value))
+        SuggestionPopup(self.desc_text, self.suggestions.description,
+                        lambda: self.desc_text.get("1.0", "insert"), self._complete_description)
+        # Tags complete one at a time: only the text after the last comma
+        SuggestionPopup(self.tags_entry, self.suggestions.tags,
+                        lambda: self.tags_var.get().rpartition(",")[2].lstrip(), self._complete_tag)
+
+    def _complete_entry(self, widget, var, value):
+        var.set(value)
+        widget.icursor("end")
+
+    def _complete_description(self, value):
+        self.desc_text.delete("1.0", "end")
+        self.desc_text.insert("1.0", value)
+
+    def _complete_tag(self, value):
+        head = self.tags_var.get().rpartition(",")[0].rstrip()
+        self.tags_var.set(f"{head}, {value}, " if head else f"{value}, ")
+        self.tags_entry.icursor("end")
+
     def _populate_fields(self):
         if self.expense:
             # Handle both old (6 fields) and new (8 fields) database records
@@ -88,7 +123,7 @@ class ExpenseForm(tk.Toplevel):
             self.comments_text.insert("1.0", comments or "")
             self.tags_var.set(tags or "")
         else:
-            self.date_var.set(datetime.today().strftime("%Y-%m-%d"))
+            self.date_var.set(datetime.today().strftime(DATE_FORMAT))
 
     def _on_save(self):
         date = self.date_var.get().strip()
@@ -99,26 +134,32 @@ class ExpenseForm(tk.Toplevel):
         comments = self.comments_text.get("1.0", "end").strip()
         tags = self.tags_var.get().strip()
 
-        if not date or not category or not amount_str:
-            messagebox.showerror("Error", "Date, category, and amount are required.")
-            return
-
         try:
-            amount = float(amount_str)
-        except ValueError:
-            messagebox.showerror("Error", "Amount must be numeric.")
-            return
-
-        try:
-            datetime.strptime(date, "%Y-%m-%d")
-        except ValueError:
-            messagebox.showerror("Error", "Invalid date format.")
+            date, amount = validate_expense(date, category, amount_str)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
             return
 
+        # Block double submits while the write runs in the background
+        self.save_button.config(state="disabled")
         if self.expense:
-            self.repo.update(self.expense[0], date, category, description, amount, payment, comments, tags)
+            self.db.submit("update", self.expense[0], date, category, description, amount, payment, comments, tags,
+                           callback=self._on_saved, error_callback=self._on_save_failed)
         else:
-            self.repo.insert(date, category, description, amount, payment, comments, tags)
-
-        self.on_save()
-        self.destroy()
+            self.db.submit("insert", date, category, description, amount, payment, comments, tags,
+                           callback=self._on_saved, error_callback=self._on_save_failed)
+
+    def _on_saved(self, row):
+        if row is not None:
+            if self.expense:
+                self.suggestions.remove_expense(self.expense)
+            self.suggestions.add_expense(row)
+            self.on_save(row)
+        if self.winfo_exists():
+            self.destroy()
+
+    def _on_save_failed(self, error):
+        if not self.winfo_exists():
+            return
+        messagebox.showerror("Error", f"Could not save expense: {error}", parent=self)
+        self.save_button.config(state="normal")
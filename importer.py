@@ -0,0 +1,296 @@
+"""
+Streaming importer for bank exports (CSV or OFX).
+
+Rows flow through a generator pipeline: parse -> validate (the same rules as
+ExpenseForm) -> dedupe -> batched insert, one transaction per batch, so the
+file is never held in memory. Duplicates are rows whose (date, amount,
+description) already exists, either in the database or earlier in the file.
+
+    python importer.py statement.csv --default-category Food --rejects rejected.csv
+"""
+
+import argparse
+import csv
+import io
+import os
+import queue
+import tkinter as tk
+from dataclasses import dataclass, replace
+from tkinter import ttk, messagebox
+
+from repository import BATCH_SIZE, DB_NAME, ExpenseRepository, batched
+from validation import validate_expense
+
+# Category used when the export has no category column
+DEFAULT_CATEGORY = "Other"
+
+# CSV header aliases, matched case-insensitively, for each expense field
+CSV_COLUMNS = {
+    "date": ("date", "transaction date", "posted date", "posting date"),
+    "category": ("category",),
+    "description": ("description", "payee", "name", "memo", "details"),
+    "amount": ("amount", "debit", "value"),
+    "payment_method": ("payment_method", "payment method", "payment", "account"),
+    "user_comments": ("user_comments", "comments", "notes"),
+    "tags": ("tags",),
+}
+
+# Bytes read at a time when tokenizing OFX
+OFX_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class ImportResult:
+    """Running totals for an import; progress callbacks receive a copy."""
+
+    read: int = 0
+    imported: int = 0
+    duplicates: int = 0
+    rejected: int = 0
+    # Fraction of the file consumed so far, 0.0 - 1.0
+    fraction: float = 0.0
+    # Stopped early by the cancelled event; the batches before it are committed
+    cancelled: bool = False
+
+
+def parse_csv(text):
+    """Yield (line number, field dict) for each data row of a CSV export."""
+    reader = csv.reader(text)
+    header = [name.strip().lower() for name in next(reader, [])]
+    positions = {}
+    for field, aliases in CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in header:
+                positions[field] = header.index(alias)
+                break
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        yield reader.line_num, {
+            field: row[index].strip() if index < len(row) else ""
+            for field, index in positions.items()
+        }
+
+
+def parse_ofx(text):
+    """Yield (transaction number, field dict) for each <STMTTRN> in an OFX export.
+
+    Handles both SGML (unclosed tags) and XML OFX by tokenizing on "<" in
+    fixed-size chunks. Debits become positive amounts; credits are not
+    expenses and carry an "error" so they are rejected.
+    """
+    number = 0
+    transaction = None
+    pending = ""
+    while True:
+        chunk = text.read(OFX_CHUNK_SIZE)
+        tokens = (pending + chunk).split("<")
+        pending = tokens.pop() if chunk else ""
+        for token in tokens:
+            tag, _, value = token.partition(">")
+            tag = tag.strip().upper()
+            value = value.strip()
+            if tag == "STMTTRN":
+                transaction = {}
+            elif tag == "/STMTTRN" and transaction is not None:
+                number += 1
+                yield number, _ofx_fields(transaction)
+                transaction = None
+            elif transaction is not None and tag and not tag.startswith("/"):
+                transaction[tag] = value
+        if not chunk:
+            break
+
+
+def _ofx_fields(transaction):
+    posted = transaction.get("DTPOSTED", "")
+    amount = transaction.get("TRNAMT", "")
+    fields = {
+        "date": f"{posted[:4]}-{posted[4:6]}-{posted[6:8]}" if len(posted) >= 8 else posted,
+        "description": transaction.get("NAME") or transaction.get("MEMO", ""),
+        "amount": amount.lstrip("-"),
+        "user_comments": transaction.get("MEMO") if transaction.get("NAME") else None,
+    }
+    if amount and not amount.startswith("-"):
+        fields["error"] = "Credit transaction (not an expense)."
+    return fields
+
+
+def validate_records(records, default_category, result, reject):
+    """Yield insert_many rows for the records that pass validate_expense()."""
+    for line, fields in records:
+        result.read += 1
+        category = fields.get("category") or default_category
+        try:
+            if fields.get("error"):
+                raise ValueError(fields["error"])
+            date, amount = validate_expense(fields.get("date", ""), category, fields.get("amount", ""))
+        except ValueError as e:
+            result.rejected += 1
+            reject(line, fields, str(e))
+            continue
+        yield (
+            date,
+            category,
+            fields.get("description", ""),
+            amount,
+            fields.get("payment_method") or None,
+            fields.get("user_comments") or None,
+            fields.get("tags") or None,
+        )
+
+
+def import_file(repo, path, fmt=None, default_category=DEFAULT_CATEGORY, batch_size=BATCH_SIZE,
+                dedupe=True, progress=None, rejects_path=None, cancelled=None):
+    """Stream an export into repo and return the ImportResult.
+
+    fmt is "csv" or "ofx" (guessed from the extension when omitted). progress
+    is called with a copy of the running ImportResult after every batch.
+    Rejected rows are written to rejects_path as CSV when it is given. Once
+    the threading.Event cancelled is set, the import stops before the next
+    batch; each batch is its own transaction, so the file is cut cleanly.
+    """
+    fmt = fmt or ("ofx" if path.lower().endswith((".ofx", ".qfx")) else "csv")
+    result = ImportResult()
+
+    rejects_file = open(rejects_path, "w", newline="", encoding="utf-8") if rejects_path else None
+    rejects_writer = csv.writer(rejects_file) if rejects_file else None
+    if rejects_writer:
+        rejects_writer.writerow(["line", "reason", "date", "category", "description", "amount"])
+
+    def reject(line, fields, reason):
+        if rejects_writer:
+            rejects_writer.writerow([line, reason, *(fields.get(name, "") for name in
+                                                    ("date", "category", "description", "amount"))])
+
+    try:
+        with open(path, "rb") as raw:
+            size = os.fstat(raw.fileno()).st_size or 1
+            text = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+            records = parse_ofx(text) if fmt == "ofx" else parse_csv(text)
+            rows = validate_records(records, default_category, result, reject)
+            for batch in batched(rows, batch_size):
+                if cancelled is not None and cancelled.is_set():
+                    result.cancelled = True
+                    return result
+                if dedupe:
+                    batch = _drop_duplicates(repo, batch, result)
+                if batch:
+                    result.imported += len(repo.insert_many(batch, batch_size))
+                result.fraction = min(raw.tell() / size, 1.0)
+                if progress:
+                    progress(replace(result))
+    finally:
+        if rejects_file:
+            rejects_file.close()
+
+    result.fraction = 1.0
+    return result
+
+
+def _drop_duplicates(repo, batch, result):
+    """Remove rows already stored or repeated within the batch.
+
+    Earlier batches are committed before this runs, so checking the database
+    also catches duplicates from earlier in the file.
+    """
+    existing = repo.get_existing_keys((row[0], row[3], row[2]) for row in batch)
+    fresh = []
+    for row in batch:
+        key = (row[0], round(row[3], 2), row[2] or "")
+        if key in existing:
+            result.duplicates += 1
+            continue
+        existing.add(key)
+        fresh.append(row)
+    return fresh
+
+
+class ImportDialog(tk.Toplevel):
+    """Progress window for an import running as a BackgroundJob.
+
+    Closing the window cancels the import after the batch being written;
+    on_done is still called with the result, since earlier batches are
+    committed.
+    """
+
+    POLL_MS = 100
+
+    def __init__(self, master, db, path, on_done, default_category=DEFAULT_CATEGORY):
+        super().__init__(master)
+        self.title("Import Expenses")
+        self.resizable(False, False)
+        self.on_done = on_done
+        # Progress arrives from the worker thread, so it is handed over via a queue
+        self._progress = queue.Queue()
+
+        tk.Label(self, text=os.path.basename(path)).pack(padx=10, pady=(10, 5))
+        self.progress_bar = ttk.Progressbar(self, length=300, maximum=1.0)
+        self.progress_bar.pack(padx=10, pady=5)
+        self.status_var = tk.StringVar(value="Starting…")
+        tk.Label(self, textvariable=self.status_var).pack(padx=10, pady=(5, 10))
+
+        self.job = db.start_job(import_file, path, default_category=default_category, progress=self._progress.put,
+                                callback=self._on_finished, error_callback=self._on_failed)
+        self.after(self.POLL_MS, self._poll)
+
+    def destroy(self):
+        self.job.cancel()
+        super().destroy()
+
+    def _poll(self):
+        if not self.winfo_exists():
+            return
+        result = None
+        while not self._progress.empty():
+            result = self._progress.get_nowait()
+        if result is not None:
+            self._show(result)
+        self.after(self.POLL_MS, self._poll)
+
+    def _show(self, result):
+        self.progress_bar.config(value=result.fraction)
+        self.status_var.set(f"{result.imported} imported, {result.duplicates} duplicates, "
+                            f"{result.rejected} rejected")
+
+    def _on_finished(self, result):
+        self.on_done(result)
+        if not self.winfo_exists():
+            return
+        self._show(result)
+        messagebox.showinfo("Import complete", self.status_var.get(), parent=self)
+        self.destroy()
+
+    def _on_failed(self, error):
+        # Reported even if the window was closed, since nothing else would tell the user
+        messagebox.showerror("Import failed", str(error), parent=self if self.winfo_exists() else self.master)
+        if self.winfo_exists():
+            self.destroy()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a CSV or OFX bank export into the expense database")
+    parser.add_argument("path", help="CSV or OFX file to import")
+    parser.add_argument("--format", choices=("csv", "ofx"), help="file format (default: from the extension)")
+    parser.add_argument("--db", default=DB_NAME, help=f"database file (default: {DB_NAME})")
+    parser.add_argument("--default-category", default=DEFAULT_CATEGORY,
+                        help="category for rows without one")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows per transaction")
+    parser.add_argument("--no-dedupe", action="store_true", help="import rows even if they already exist")
+    parser.add_argument("--rejects", help="write rejected rows and reasons to this CSV file")
+    args = parser.parse_args()
+
+    def report(result):
+        print(f"\r📥 {result.fraction:6.1%}  {result.imported} imported, {result.duplicates} duplicates, "
+              f"{result.rejected} rejected", end="", flush=True)
+
+    with ExpenseRepository(args.db) as repo:
+        result = import_file(repo, args.path, fmt=args.format, default_category=args.default_category,
+                             batch_size=args.batch_size, dedupe=not args.no_dedupe, progress=report,
+                             rejects_path=args.rejects)
+    report(result)
+    print(f"\n✅ Read {result.read} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Opt-in timing of repository calls and UI phases.
+
+Instrumented functions record their wall time (and, for calls that return
+a list or set, the number of rows) into per-name histograms. Recording is
+off by default; each instrumented call then costs one flag check. Turn it
+on by setting EXPENSE_TRACKER_PROFILE before starting the app ("1", or a
+JSON file to write the stats to on exit), from the Performance panel
+(Ctrl+Alt+P), or with enable().
+
+    EXPENSE_TRACKER_PROFILE=profile.json python main.py
+"""
+
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+
+PROFILE_ENV = "EXPENSE_TRACKER_PROFILE"
+
+# Histogram bucket upper bounds in milliseconds: 0.05 ms doubling up to ~26 s,
+# plus an overflow bucket
+BUCKET_BOUNDS_MS = tuple(0.05 * 2 ** i for i in range(20))
+
+_enabled = False
+_lock = threading.Lock()
+_histograms = {}
+
+
+class Histogram:
+    """Log-bucketed durations for one instrumented name."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms = None
+        self.max_ms = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+
+    def add(self, ms, rows=None):
+        self.count += 1
+        self.total_ms += ms
+        self.min_ms = ms if self.min_ms is None else min(self.min_ms, ms)
+        self.max_ms = max(self.max_ms, ms)
+        if rows is not None:
+            self.rows += rows
+        for index, bound in enumerate(BUCKET_BOUNDS_MS):
+            if ms <= bound:
+                break
+        else:
+            index = len(BUCKET_BOUNDS_MS)
+        self.buckets[index] += 1
+
+    def percentile(self, percent):
+        """Estimate a percentile as the upper bound of the bucket it falls in."""
+        if not self.count:
+            return 0.0
+        wanted = self.count * percent / 100
+        seen = 0
+        for bound, count in zip(BUCKET_BOUNDS_MS, self.buckets):
+            seen += count
+            if seen >= wanted:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": self.total_ms,
+            "mean_ms": self.total_ms / self.count if self.count else 0.0,
+            "min_ms": self.min_ms or 0.0,
+            "max_ms": self.max_ms,
+            "p50_ms": self.percentile(50),
+            "p90_ms": self.percentile(90),
+            "p99_ms": self.percentile(99),
+            "rows": self.rows,
+            "buckets": [[bound, count] for bound, count in zip(BUCKET_BOUNDS_MS + (None,), self.buckets)
+                        if count],
+        }
+
+
+def enabled():
+    return _enabled
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = on
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+def record(name, seconds, rows=None):
+    """Add one duration to name's histogram (when enabled)."""
+    if not _enabled:
+        return
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.add(seconds * 1000, rows)
+
+
+def clock():
+    """Return a start time for record_since(), or None when disabled."""
+    return time.perf_counter() if _enabled else None
+
+
+def record_since(name, started, rows=None):
+    """Record the time since clock() returned started; a None start is ignored."""
+    if started is not None:
+        record(name, time.perf_counter() - started, rows)
+
+
+def stats():
+    """Return {name: Histogram.to_dict()} for everything recorded so far."""
+    with _lock:
+        return {name: histogram.to_dict() for name, histogram in sorted(_histograms.items())}
+
+
+def dump_json(path):
+    """Write stats() to path as JSON."""
+    with open(path, "w") as f:
+        json.dump({"recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "stats": stats()}, f, indent=2)
+
+
+def configure_from_env():
+    """Enable recording if PROFILE_ENV is set; return the JSON path to dump to on exit, if any."""
+    value = os.environ.get(PROFILE_ENV, "")
+    if value:
+        enable()
+    return value if value not in ("", "0", "1") else None
+
+
+def _row_count(result):
+    return len(result) if isinstance(result, (list, set)) else None
+
+
+def timed(name=None):
+    """Decorator recording each call under name (default: the function's qualified name).
+
+    Generator functions are timed across all their steps, excluding the
+    time the consumer spends between chunks, and count the rows yielded.
+    """
+    def decorate(func):
+        label = name or func.__qualname__
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not _enabled:
+                    return (yield from func(*args, **kwargs))
+                chunks = func(*args, **kwargs)
+                elapsed, rows = 0.0, 0
+                try:
+                    while True:
+                        start = time.perf_counter()
+                        try:
+                            chunk = next(chunks)
+                        except StopIteration:
+                            break
+                        finally:
+                            elapsed += time.perf_counter() - start
+                        rows += len(chunk)
+                        yield chunk
+                finally:
+                    chunks.close()
+                    record(label, elapsed, rows)
+            return wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            record(label, time.perf_counter() - start, _row_count(result))
+            return result
+        return wrapper
+    return decorate
+
+
+def instrument_methods(cls):
+    """Class decorator applying timed() to every public method defined on cls."""
+    for attr, value in list(vars(cls).items()):
+        if not attr.startswith("_") and inspect.isfunction(value):
+            setattr(cls, attr, timed(f"{cls.__name__}.{attr}")(value))
+    return cls
@@ -1,57 +1,271 @@
 """Main Tkinter application for the expense tracker."""
 
+import importlib
+import threading
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 
-from repository import ExpenseRepository
+import instrumentation
+from repository import ExpenseRepository, PAGE_SIZE
+from async_repository import AsyncRepository
+from autocomplete import ExpenseSuggestions
+from change_notifier import ChangeNotifier
 from forms import ExpenseForm
-from dashboard import DashboardWindow
+
+# Modules imported in the background once the main window is up, so opening
+# the dashboard later does not stall on matplotlib. The Tk backend itself is
+# left for the Tk thread.
+WARMUP_MODULES = ("matplotlib.figure", "matplotlib.backends.backend_agg", "dashboard")
+WARMUP_DELAY_MS = 1000
 
 
 class ExpenseApp(tk.Tk):
+    # Load the next page once the visible rows are within this fraction of the end
+    PREFETCH_MARGIN = 0.2
+    # Wait this long after the last keystroke before running a search
+    SEARCH_DEBOUNCE_MS = 250
+
     def __init__(self):
         super().__init__()
         self.title("Expense Tracker")
         self.geometry("800x400")
+        self._profile_path = instrumentation.configure_from_env()
 
         self.repo = ExpenseRepository()
+        self.db = AsyncRepository(self, self.repo)
+        self.notifier = ChangeNotifier(self, self.db)
+        # Autocomplete values for the expense form, filled in once loaded
+        self.suggestions = ExpenseSuggestions()
         self._build_menu()
         self._build_table()
+        self._build_status_bar()
         self.refresh()
+        self._load_suggestions()
+        self.notifier.subscribe(self._on_data_changed)
+        self.notifier.start()
+        self.after(WARMUP_DELAY_MS, self._start_warmup)
+
+    def _load_suggestions(self):
+        self.db.submit(ExpenseSuggestions.load, callback=self._set_suggestions, background=True)
+
+    def _set_suggestions(self, suggestions):
+        self.suggestions = suggestions
+
+    def _start_warmup(self):
+        threading.Thread(target=_warm_up_imports, name="import-warmup", daemon=True).start()
 
     def _build_menu(self):
         menubar = tk.Menu(self)
         file_menu = tk.Menu(menubar, tearoff=0)
+        file_menu.add_command(label="Import…", command=self.import_file)
+        file_menu.add_command(label="Export…", command=self.export_file)
         file_menu.add_command(label="Dashboard", command=self.open_dashboard)
         file_menu.add_separator()
         file_menu.add_command(label="Quit", command=self.quit)
         menubar.add_cascade(label="File", menu=file_menu)
         self.config(menu=menubar)
+        self.file_menu = file_menu
+        # The Performance entry stays hidden until profiling is turned on
+        self._performance_item = False
+        if instrumentation.enabled():
+            self._show_performance_item()
+        self.bind_all("<Control-Alt-p>", lambda event: self.open_performance())
+
+    def _show_performance_item(self):
+        if not self._performance_item:
+            self.file_menu.insert_command(self.file_menu.index("Dashboard") + 1, label="Performance",
+                                          command=self.open_performance)
+            self._performance_item = True
 
     def _build_table(self):
         toolbar = tk.Frame(self)
         toolbar.pack(fill="x", pady=5)
 
         tk.Button(toolbar, text="Add", command=self.add).pack(side="left", padx=3)
+        tk.Button(toolbar, text="Batch Add", command=self.add_batch).pack(side="left", padx=3)
         tk.Button(toolbar, text="Edit", command=self.edit).pack(side="left", padx=3)
         tk.Button(toolbar, text="Delete", command=self.delete).pack(side="left", padx=3)
         tk.Button(toolbar, text="Dashboard", command=self.open_dashboard).pack(side="left", padx=3)
 
+        # Search-as-you-type over description, comments and tags
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", self._on_search_changed)
+        tk.Entry(toolbar, textvariable=self.search_var, width=25).pack(side="right", padx=3)
+        tk.Label(toolbar, text="Search:").pack(side="right")
+        self._search_query = ""
+        self._search_after_id = None
+
         cols = ("id", "date", "category", "description", "amount", "payment_method", "comments", "tags")
-        self.tree = ttk.Treeview(self, columns=cols, show="headings")
+        table_frame = tk.Frame(self)
+        table_frame.pack(fill="both", expand=True)
+
+        self.tree = ttk.Treeview(table_frame, columns=cols, show="headings")
         for c in cols:
             self.tree.heading(c, text=c.capitalize())
 
-        self.tree.pack(fill="both", expand=True)
+        self.scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_tree_scroll)
+
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        # Treeview item ids are expense ids. _row_keys holds the (date, id) sort
+        # key of every loaded item in display (descending) order.
+        self._row_keys = []
+        self._last_key = None
+        self._has_more = False
+        self._loading = False
+        self._refresh_started = None
+
+    def _build_status_bar(self):
+        self.status_var = tk.StringVar()
+        tk.Label(self, textvariable=self.status_var, anchor="w").pack(fill="x", padx=5)
+        self.db.add_busy_listener(self._on_busy_changed)
+
+    def _on_busy_changed(self, busy):
+        self.status_var.set("Loading…" if busy else "")
 
     def refresh(self):
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-        for exp in self.repo.get_all():
-            # Handle the case where old records might not have comments/tags
-            if len(exp) < 8:
-                exp = exp + (None, None)  # Add None for comments and tags
-            self.tree.insert("", "end", values=exp)
+        """Reload the table from the first page; later pages load as the user scrolls."""
+        self._refresh_started = instrumentation.clock()
+        if self._search_query:
+            self._run_search()
+            return
+        self._loading = True
+        self.db.submit("get_page", None, callback=self._show_first_page, key="table")
+
+    def _on_search_changed(self, *args):
+        if self._search_after_id is not None:
+            self.after_cancel(self._search_after_id)
+        self._search_after_id = self.after(self.SEARCH_DEBOUNCE_MS, self._apply_search)
+
+    def _apply_search(self):
+        self._search_after_id = None
+        query = self.search_var.get().strip()
+        if query == self._search_query:
+            return
+        self._search_query = query
+        self.refresh()
+
+    def _run_search(self):
+        # Shares the "table" key, so a newer search or page load supersedes this one
+        self._loading = True
+        self.db.submit("search", self._search_query, callback=self._show_search_results, key="table")
+
+    def _show_search_results(self, rows):
+        """Show ranked search results; paging is off until the search is cleared."""
+        self._show_first_page(rows)
+        self._has_more = False
+
+    def _show_first_page(self, rows):
+        self.tree.delete(*self.tree.get_children())
+        self._row_keys = []
+        self._last_key = None
+        self._append_page(rows)
+        # From the refresh() request to the first page being in the tree
+        instrumentation.record_since("ExpenseApp.refresh", self._refresh_started, len(rows))
+        self._refresh_started = None
+
+    def _load_next_page(self):
+        self._loading = True
+        self.db.submit("get_page", self._last_key, callback=self._append_page, key="table")
+
+    @instrumentation.timed()
+    def _append_page(self, rows):
+        self._loading = False
+        for exp in rows:
+            self.tree.insert("", "end", iid=str(exp[0]), values=exp)
+            self._row_keys.append((exp[1], exp[0]))
+        if rows:
+            self._last_key = (rows[-1][1], rows[-1][0])
+        self._has_more = len(rows) == PAGE_SIZE
+
+    def _on_tree_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self._has_more and not self._loading and float(last) >= 1.0 - self.PREFETCH_MARGIN:
+            self._load_next_page()
+
+    def _on_data_changed(self, external):
+        # Our own writes are already patched in by apply_saved/apply_deleted
+        if external:
+            if self._search_query:
+                self._run_search()
+            else:
+                self._reload_loaded_rows()
+
+    def _reload_loaded_rows(self):
+        """Re-read the rows currently loaded and patch only the items that differ."""
+        limit = max(len(self._row_keys), PAGE_SIZE)
+        self._loading = True
+        self.db.submit("get_page", None, limit, callback=lambda rows: self._sync_rows(rows, limit), key="table")
+
+    def _sync_rows(self, rows, limit):
+        wanted = {str(exp[0]) for exp in rows}
+        stale = [iid for iid in self.tree.get_children() if iid not in wanted]
+        if stale:
+            self.tree.delete(*stale)
+        for index, exp in enumerate(rows):
+            iid = str(exp[0])
+            if self.tree.exists(iid):
+                self.tree.item(iid, values=exp)
+                if self.tree.index(iid) != index:
+                    self.tree.move(iid, "", index)
+            else:
+                self.tree.insert("", index, iid=iid, values=exp)
+        self._row_keys = [(exp[1], exp[0]) for exp in rows]
+        self._last_key = self._row_keys[-1] if rows else None
+        self._loading = False
+        self._has_more = len(rows) == limit
+
+    def _sorted_index(self, key):
+        """Binary-search the display position of a (date, id) key."""
+        lo, hi = 0, len(self._row_keys)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._row_keys[mid] > key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def apply_saved(self, row):
+        """Patch a newly inserted or updated expense row into the table."""
+        if self._search_query:
+            # Results are in relevance order, so let the search place the row
+            self._run_search()
+            return
+        self.apply_deleted(row[0])
+        key = (row[1], row[0])
+        if (self._has_more or self._loading) and self._last_key is not None and key < self._last_key:
+            # Falls past the loaded pages; it will arrive with a later page
+            return
+        index = self._sorted_index(key)
+        self._row_keys.insert(index, key)
+        self.tree.insert("", index, iid=str(row[0]), values=row)
+
+    def apply_saved_many(self, rows):
+        """Patch a batch of saved rows into the table in one go."""
+        if self._search_query:
+            self._run_search()
+            return
+        for row in rows:
+            self.apply_saved(row)
+
+    def apply_deleted(self, expense_id):
+        """Remove an expense's item from the table if it is loaded."""
+        iid = str(expense_id)
+        if not self.tree.exists(iid):
+            return
+        del self._row_keys[self.tree.index(iid)]
+        self.tree.delete(iid)
+
+    def destroy(self):
+        if self._profile_path:
+            instrumentation.dump_json(self._profile_path)
+        self.notifier.stop()
+        self.db.close()
+        self.repo.close()
+        super().destroy()
 
     def selected(self):
         sel = self.tree.selection()
@@ -61,17 +275,26 @@ class ExpenseApp(tk.Tk):
         # Ensure we have all 8 fields
         while len(vals) < 8:
             vals = vals + (None,)
-        return (int(vals[0]), *vals[1:])
+        return (int(sel[0]), *vals[1:])
 
     def add(self):
-        ExpenseForm(self, self.repo, self.refresh)
+        ExpenseForm(self, self.db, self.apply_saved, suggestions=self.suggestions)
+
+    def add_batch(self):
+        from batch_entry import BatchEntryWindow
+        BatchEntryWindow(self, self.db, self._on_batch_saved, suggestions=self.suggestions)
+
+    def _on_batch_saved(self, rows):
+        self.apply_saved_many(rows)
+        # The batch runs as a plain callable, so other windows are told explicitly
+        self.notifier.publish(external=False)
 
     def edit(self):
         exp = self.selected()
         if not exp:
             messagebox.showinfo("No selection", "Select an expense.")
             return
-        ExpenseForm(self, self.repo, self.refresh, expense=exp)
+        ExpenseForm(self, self.db, self.apply_saved, expense=exp, suggestions=self.suggestions)
 
     def delete(self):
         exp = self.selected()
@@ -79,11 +302,67 @@ class ExpenseApp(tk.Tk):
             messagebox.showinfo("No selection", "Select an expense.")
             return
         if messagebox.askyesno("Confirm", "Delete selected?"):
-            self.repo.delete(exp[0])
-            self.refresh()
+            self.db.submit("delete", exp[0], callback=lambda row: self._on_deleted(exp))
+
+    def _on_deleted(self, exp):
+        self.apply_deleted(exp[0])
+        self.suggestions.remove_expense(exp)
+
+    def import_file(self):
+        path = filedialog.askopenfilename(
+            parent=self,
+            title="Import bank export",
+            filetypes=[("Bank exports", "*.csv *.ofx *.qfx"), ("All files", "*.*")],
+        )
+        if path:
+            from importer import ImportDialog
+            ImportDialog(self, self.db, path, self._on_imported)
+
+    def _on_imported(self, result):
+        self.refresh()
+        self._load_suggestions()
+        # Imports write on their own connection, so other windows are told explicitly
+        self.notifier.publish(external=False)
+
+    def export_file(self):
+        from exporter import export_expenses, snapshot_format
+        filetypes = [("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("NumPy snapshot", "*.npz")]
+        # Parquet needs pyarrow, which is optional
+        if snapshot_format() == "parquet":
+            filetypes.insert(2, ("Parquet", "*.parquet"))
+        path = filedialog.asksaveasfilename(
+            parent=self,
+            title="Export expenses",
+            defaultextension=".csv",
+            filetypes=filetypes,
+        )
+        if path:
+            # Its own thread and connection, so the table stays usable during a long export
+            self.db.start_job(
+                export_expenses, path,
+                callback=lambda result: messagebox.showinfo(
+                    "Export complete", f"Exported {result[1]} expenses to {result[0]}"),
+            )
 
     def open_dashboard(self):
-        DashboardWindow(self, self.repo)
+        from dashboard import DashboardWindow
+        DashboardWindow(self, self.db, self.notifier)
+
+    def open_performance(self):
+        """Turn profiling on and show the timing histograms."""
+        from performance_panel import PerformancePanel
+        instrumentation.enable()
+        self._show_performance_item()
+        PerformancePanel(self)
+
+
+def _warm_up_imports():
+    for name in WARMUP_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            # The dashboard reports a missing matplotlib when it is opened
+            return
 
 
 if __name__ == "__main__":
@@ -1,11 +1,21 @@
 """
-database migration script to add new columns to existing expenses table.
+database migration script that upgrades the expenses schema to the current version.
 This script handles both fresh installations and migrations from existing databases.
 """
 
+import argparse
+import contextlib
+import datetime
 import sqlite3
 import os
-from repository import DB_NAME
+import time
+from dataclasses import dataclass
+from repository import DB_NAME, SCHEMA_VERSION
+
+# Rows copied per transaction by an online migration; the write lock is held for one chunk at a time
+CHUNK_SIZE = 5000
+# How long an online migration waits for the app's writes to finish before giving up
+BUSY_TIMEOUT_S = 30
 
 
 def check_table_schema():
@@ -24,8 +34,17 @@ def check_table_schema():
         return []
 
 
+def get_schema_version():
+    """Return the PRAGMA user_version stored in the database."""
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
 def migrate_database():
-    """Add user_comments and tags columns to existing expenses table."""
+    """Run the repository's pending schema migrations on the existing database."""
     print("🔧 Starting database migration...")
 
     # Check if database exists
@@ -35,69 +54,54 @@ def migrate_database():
 
     # Check current schema
     current_columns = check_table_schema()
+    current_version = get_schema_version()
     print(f"📋 Current columns: {current_columns}")
+    print(f"🔢 Schema version: {current_version} (latest: {SCHEMA_VERSION})")
 
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
+    if current_version >= SCHEMA_VERSION:
+        print("✅ Database is already up to date")
+        return True
 
+    # Opening the repository applies every migration that is behind
+    from repository import ExpenseRepository
     try:
-        migration_needed = False
-
-        # Check and add user_comments column
-        if 'user_comments' not in current_columns:
-            print("➕ Adding user_comments column...")
-            cursor.execute("ALTER TABLE expenses ADD COLUMN user_comments TEXT")
-            migration_needed = True
-            print("✅ user_comments column added")
-        else:
-            print("✅ user_comments column already exists")
-
-        # Check and add tags column
-        if 'tags' not in current_columns:
-            print("➕ Adding tags column...")
-            cursor.execute("ALTER TABLE expenses ADD COLUMN tags TEXT")
-            migration_needed = True
-            print("✅ tags column added")
-        else:
-            print("✅ tags column already exists")
-
-        if migration_needed:
-            conn.commit()
-            print("🎉 Database migration completed successfully!")
-        else:
-            print("✅ Database is already up to date")
-
-        # Verify the migration
-        final_columns = check_table_schema()
-        print(f"📋 Final schema: {final_columns}")
-
-        if 'user_comments' in final_columns and 'tags' in final_columns:
-            print("✅ Migration verification successful")
-            return True
-        else:
-            print("❌ Migration verification failed")
-            return False
-
+        with ExpenseRepository():
+            pass
     except sqlite3.Error as e:
         print(f"❌ Migration error: {e}")
-        conn.rollback()
         return False
-    finally:
-        conn.close()
+    print("🎉 Database migration completed successfully!")
+
+    # Verify the migration
+    final_columns = check_table_schema()
+    final_version = get_schema_version()
+    print(f"📋 Final schema: {final_columns}")
+    print(f"🔢 Final schema version: {final_version}")
+
+    if 'user_comments' in final_columns and 'tags' in final_columns and final_version == SCHEMA_VERSION:
+        print("✅ Migration verification successful")
+        return True
+    else:
+        print("❌ Migration verification failed")
+        return False
 
 
 def create_fresh_database():
     """Create a fresh database with the complete schema."""
     print("🆕 Creating fresh database with enhanced schema...")
 
-    # Remove existing database if it exists
+    # Remove existing database (and any WAL side files) if it exists
     if os.path.exists(DB_NAME):
         os.remove(DB_NAME)
         print(f"🗑️  Removed existing {DB_NAME}")
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(DB_NAME + suffix):
+            os.remove(DB_NAME + suffix)
 
     # Import and create fresh repository
     from repository import ExpenseRepository
-    repo = ExpenseRepository()
+    with ExpenseRepository():
+        pass
 
     # Verify the schema
     columns = check_table_schema()
@@ -111,8 +115,371 @@ def create_fresh_database():
         return False
 
 
+def check_summaries(rebuild=False):
+    """Verify (and optionally rebuild) the trigger-maintained summary tables."""
+    from repository import ExpenseRepository
+    with ExpenseRepository() as repo:
+        if rebuild:
+            print("🔄 Rebuilding summary tables...")
+            repo.rebuild_summaries()
+
+        mismatches = repo.verify_summaries()
+        if not mismatches:
+            print("✅ Summary tables match the expenses table")
+            return True
+
+        print(f"❌ {len(mismatches)} summary rows disagree with the expenses table:")
+        for table, key, stored, expected in mismatches:
+            print(f"    {table}[{key}]: stored={stored} expected={expected}")
+        print("💡 Run with --rebuild-summaries to recompute them")
+        return False
+
+
+def convert_to_compact(chunk_size=CHUNK_SIZE, pause=0.0, max_chunks=None):
+    """Convert the database to the compact integer-cents / integer-days layout, chunk by chunk.
+
+    The app can keep running while rows are copied and picks up the new
+    layout after the swap. An interrupted conversion resumes where it stopped.
+    """
+    if not os.path.exists(DB_NAME):
+        print(f"❌ Database {DB_NAME} does not exist")
+        return False
+
+    from repository import ExpenseRepository
+    size_before = os.path.getsize(DB_NAME)
+    with ExpenseRepository() as repo:
+        if repo.storage.compact:
+            print("✅ Database already uses the compact layout")
+            return True
+        if repo.archives:
+            print("❌ Years have already been archived in the legacy layout; convert before archiving")
+            return False
+
+    print(f"🔄 Rebuilding expenses with integer cents and days, {chunk_size} rows per chunk...")
+    try:
+        result = run_shadow_migration(compact_migration(), chunk_size=chunk_size, pause=pause,
+                                      max_chunks=max_chunks, progress=_print_progress)
+    except ValueError as e:
+        print(f"❌ Cannot convert: {e}")
+        return False
+    except sqlite3.Error as e:
+        print(f"\n❌ Conversion stopped, expenses table left unchanged: {e}")
+        print("💡 Chunks copied so far are kept; re-run to resume")
+        return False
+    print()
+    print(f"⏱️  {result.copied} rows in {result.seconds:.1f}s ({result.rows_per_second:.0f} rows/s), "
+          f"{result.chunks} chunks, longest lock {result.longest_lock_ms:.0f} ms")
+    if not result.swapped:
+        print(f"⏸️  Stopped after {result.chunks} chunks ({result.done}/{result.total} rows); re-run to continue")
+        return True
+
+    with ExpenseRepository() as repo:
+        mismatches = repo.verify_summaries()
+
+    # Give the freed pages back to the filesystem
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        conn.execute("VACUUM")
+    except sqlite3.OperationalError as e:
+        print(f"⚠️  Could not VACUUM ({e}); the freed pages will be reused, or close the app and re-run")
+    finally:
+        conn.close()
+
+    size_after = os.path.getsize(DB_NAME)
+    print(f"📦 {size_before / 1024:.0f} KB -> {size_after / 1024:.0f} KB")
+    if mismatches:
+        print(f"❌ {len(mismatches)} summary rows disagree after conversion; run --rebuild-summaries")
+        return False
+    print("✅ Converted to the compact layout")
+    return True
+
+
+def _print_progress(result):
+    print(f"\r    {result.done}/{result.total} rows ({min(result.done / max(result.total, 1), 1):.0%}), "
+          f"{result.rows_per_second:.0f} rows/s", end="", flush=True)
+
+
+def rollover(through_year):
+    """Move every year up to through_year into read-only per-year archive files."""
+    if not os.path.exists(DB_NAME):
+        print(f"❌ Database {DB_NAME} does not exist")
+        return False
+
+    from repository import ExpenseRepository, archive_path
+    size_before = os.path.getsize(DB_NAME)
+    with ExpenseRepository() as repo:
+        print(f"📦 Archiving expenses dated {through_year} or earlier...")
+        try:
+            moved = repo.archive_years(
+                through_year,
+                progress=lambda year, rows: print(f"    {year}: {rows} rows -> {archive_path(DB_NAME, year)}"),
+            )
+        except (sqlite3.Error, ValueError) as e:
+            print(f"❌ Rollover failed: {e}")
+            print("💡 Any year not reported above is still in the main database; re-run to finish")
+            return False
+        mismatches = repo.verify_summaries()
+
+    if not moved:
+        print("✅ Nothing to archive")
+        return True
+
+    # Give the pages of the moved rows back to the filesystem
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+    size_after = os.path.getsize(DB_NAME)
+    print(f"📦 {DB_NAME}: {size_before / 1024:.0f} KB -> {size_after / 1024:.0f} KB")
+    if mismatches:
+        print(f"❌ {len(mismatches)} summary rows disagree after the rollover; run --rebuild-summaries")
+        return False
+    print(f"✅ Archived {sum(moved.values())} expenses from {len(moved)} years")
+    return True
+
+
+# Online migrations. A table is rewritten into a shadow table in bounded
+# chunks, each its own short transaction, so the app can keep reading and
+# writing in between. Triggers mirror writes to rows that were already
+# copied, migration_progress records the last copied id so an interrupted
+# run resumes where it stopped, and the shadow replaces the table in one
+# final transaction.
+@dataclass(frozen=True)
+class ShadowMigration:
+    """A rewrite of one table into a new definition, run by run_shadow_migration()."""
+
+    name: str
+    table: str
+    shadow: str
+    # CREATE TABLE statement for the shadow table
+    create_sql: str
+    # Shadow columns filled from each row of table, and the SQL for their values; {row} is "NEW." or ""
+    columns: str
+    values: str
+    # Optional callables taking the connection. check prepares table in the transaction that
+    # creates the shadow and raises ValueError if the rewrite cannot start; finish runs in the swap
+    # transaction after the shadow has been renamed to table, and must recreate the indexes and
+    # triggers that were dropped with the old table.
+    check: object = None
+    finish: object = None
+
+
+@dataclass
+class MigrationResult:
+    """What one run_shadow_migration() call did."""
+
+    # Rows copied by this run and by earlier, interrupted runs
+    copied: int
+    resumed_from: int
+    total: int
+    chunks: int
+    seconds: float
+    longest_lock_ms: float
+    swapped: bool
+
+    @property
+    def done(self):
+        return self.resumed_from + self.copied
+
+    @property
+    def rows_per_second(self):
+        return self.copied / self.seconds if self.seconds else 0.0
+
+
+def compact_migration():
+    """Return the ShadowMigration that converts a legacy expenses table to the compact layout."""
+    from repository import (_COMPACT_COLUMNS, _COMPACT_TABLE, _COMPACT_VALUES, _finish_compact,
+                            _normalize_dates)
+    return ShadowMigration(
+        name="compact", table="expenses", shadow="expenses_compact", create_sql=_COMPACT_TABLE,
+        columns=_COMPACT_COLUMNS, values=_COMPACT_VALUES, check=_normalize_dates, finish=_finish_compact,
+    )
+
+
+def run_shadow_migration(migration, db_name=DB_NAME, chunk_size=CHUNK_SIZE, pause=0.0, max_chunks=None,
+                         progress=None):
+    """Copy migration.table into its shadow chunk by chunk, then swap the shadow in.
+
+    Resumes from migration_progress if an earlier run was interrupted.
+    pause seconds are slept between chunks to leave room for other writers;
+    after max_chunks chunks the run stops without swapping (run again to
+    continue). progress(result) is called with the MigrationResult so far
+    after each chunk.
+    """
+    conn = sqlite3.connect(db_name, timeout=BUSY_TIMEOUT_S, isolation_level=None)
+    try:
+        last_id, resumed_from = _start_shadow_migration(conn, migration)
+        copy = (
+            f"INSERT OR REPLACE INTO {migration.shadow} ({migration.columns}) "
+            f"SELECT {migration.values.format(row='')} FROM {migration.table} WHERE id > ? AND id <= ?"
+        )
+        total = conn.execute(f"SELECT COUNT(*) FROM {migration.table}").fetchone()[0]
+        result = MigrationResult(copied=0, resumed_from=resumed_from, total=total, chunks=0, seconds=0.0,
+                                 longest_lock_ms=0.0, swapped=False)
+        started = time.perf_counter()
+        while max_chunks is None or result.chunks < max_chunks:
+            chunk_started = time.perf_counter()
+            with _transaction(conn):
+                upper = conn.execute(
+                    f"SELECT MAX(id) FROM (SELECT id FROM {migration.table} WHERE id > ? ORDER BY id LIMIT ?)",
+                    (last_id, chunk_size),
+                ).fetchone()[0]
+                if upper is None:
+                    break
+                copied = conn.execute(copy, (last_id, upper)).rowcount
+                conn.execute(
+                    "UPDATE migration_progress SET last_id = ?, copied = copied + ? WHERE name = ?",
+                    (upper, copied, migration.name),
+                )
+            last_id = upper
+            result.chunks += 1
+            result.copied += copied
+            result.longest_lock_ms = max(result.longest_lock_ms, (time.perf_counter() - chunk_started) * 1000)
+            result.seconds = time.perf_counter() - started
+            if progress:
+                progress(result)
+            if pause:
+                time.sleep(pause)
+        else:
+            return result
+
+        swap_started = time.perf_counter()
+        with _transaction(conn):
+            _swap_shadow(conn, migration)
+        result.longest_lock_ms = max(result.longest_lock_ms, (time.perf_counter() - swap_started) * 1000)
+        result.seconds = time.perf_counter() - started
+        result.swapped = True
+        return result
+    finally:
+        conn.close()
+
+
+@contextlib.contextmanager
+def _transaction(conn):
+    """BEGIN IMMEDIATE ... COMMIT on an autocommit connection, rolling back on error."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _start_shadow_migration(conn, migration):
+    """Set up the shadow table, sync triggers and progress row unless a run is underway.
+
+    Returns the last id already copied and how many rows that was.
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS migration_progress (
+            name TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL,
+            copied INTEGER NOT NULL,
+            started TEXT NOT NULL
+        )
+        """
+    )
+    with _transaction(conn):
+        state = conn.execute(
+            "SELECT last_id, copied FROM migration_progress WHERE name = ?", (migration.name,)
+        ).fetchone()
+        has_shadow = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (migration.shadow,)
+        ).fetchone()
+        if state and has_shadow:
+            return state
+
+        if migration.check:
+            migration.check(conn)
+        conn.execute(f"DROP TABLE IF EXISTS {migration.shadow}")
+        conn.execute(migration.create_sql)
+        # Rows written while the copy runs are mirrored into the shadow; a row
+        # mirrored ahead of the copy is simply replaced by the same values again.
+        new_values = migration.values.format(row="NEW.")
+        conn.execute(
+            f"""
+            CREATE TRIGGER {migration.shadow}_sync_insert AFTER INSERT ON {migration.table} BEGIN
+                INSERT OR REPLACE INTO {migration.shadow} ({migration.columns}) VALUES ({new_values});
+            END
+            """
+        )
+        conn.execute(
+            f"""
+            CREATE TRIGGER {migration.shadow}_sync_update AFTER UPDATE ON {migration.table} BEGIN
+                DELETE FROM {migration.shadow} WHERE id = OLD.id;
+                INSERT OR REPLACE INTO {migration.shadow} ({migration.columns}) VALUES ({new_values});
+            END
+            """
+        )
+        conn.execute(
+            f"""
+            CREATE TRIGGER {migration.shadow}_sync_delete AFTER DELETE ON {migration.table} BEGIN
+                DELETE FROM {migration.shadow} WHERE id = OLD.id;
+            END
+            """
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO migration_progress (name, last_id, copied, started) "
+            "VALUES (?, 0, 0, datetime('now'))",
+            (migration.name,),
+        )
+    return 0, 0
+
+
+def _swap_shadow(conn, migration):
+    """Replace migration.table with its fully copied shadow; the caller owns the transaction."""
+    sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (migration.table,)).fetchone()
+    # Dropping the table also drops its indexes and triggers, the sync triggers included
+    conn.execute(f"DROP TABLE {migration.table}")
+    conn.execute(f"ALTER TABLE {migration.shadow} RENAME TO {migration.table}")
+    if sequence:
+        # Keep ids of deleted rows from being handed out again
+        conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (sequence[0], migration.table))
+    if migration.finish:
+        migration.finish(conn)
+    conn.execute("DELETE FROM migration_progress WHERE name = ?", (migration.name,))
+
+
 def main():
     """Main migration function with options."""
+    parser = argparse.ArgumentParser(description="Expense Tracker database migration tool")
+    parser.add_argument("--verify-summaries", action="store_true",
+                        help="check the summary tables against the expenses table and exit")
+    parser.add_argument("--rebuild-summaries", action="store_true",
+                        help="recompute the summary tables, verify them and exit")
+    parser.add_argument("--migrate", action="store_true",
+                        help="apply pending schema migrations without prompting, then exit")
+    parser.add_argument("--compact", action="store_true",
+                        help="store amounts as integer cents and dates as integer days, copying in chunks "
+                             "while the app keeps running, then exit; re-run to resume an interrupted run")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, metavar="ROWS",
+                        help=f"rows copied per transaction by --compact (default: {CHUNK_SIZE})")
+    parser.add_argument("--pause-ms", type=float, default=0, metavar="MS",
+                        help="sleep between chunks to leave room for the app's writes (default: 0)")
+    parser.add_argument("--max-chunks", type=int, metavar="N",
+                        help="stop --compact after N chunks without swapping; re-run to continue")
+    parser.add_argument("--rollover", type=int, nargs="?", const=datetime.date.today().year - 1, metavar="YEAR",
+                        help="move expenses dated YEAR (default: last year) or earlier into read-only "
+                             "per-year archive files, then exit (close the app first)")
+    args = parser.parse_args()
+
+    if args.rollover is not None:
+        raise SystemExit(0 if rollover(args.rollover) else 1)
+
+    if args.compact:
+        raise SystemExit(0 if convert_to_compact(args.chunk_size, args.pause_ms / 1000, args.max_chunks) else 1)
+
+    if args.migrate:
+        success = migrate_database() if os.path.exists(DB_NAME) else create_fresh_database()
+        raise SystemExit(0 if success else 1)
+
+    if args.verify_summaries or args.rebuild_summaries:
+        raise SystemExit(0 if check_summaries(rebuild=args.rebuild_summaries) else 1)
+
     print("🚀 Expense Tracker Database Migration Tool")
     print("=" * 50)
 
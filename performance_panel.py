@@ -0,0 +1,77 @@
+"""Performance panel showing the instrumentation histograms, opened from File → Performance."""
+
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+
+import instrumentation
+
+
+class PerformancePanel(tk.Toplevel):
+    """Live table of timings per instrumented name, slowest total first."""
+
+    # How often the table is re-read while the panel is open
+    REFRESH_MS = 1000
+
+    COLUMNS = (
+        ("name", "Name", 260),
+        ("count", "Calls", 60),
+        ("total_ms", "Total ms", 80),
+        ("mean_ms", "Mean", 70),
+        ("p50_ms", "p50", 70),
+        ("p90_ms", "p90", 70),
+        ("p99_ms", "p99", 70),
+        ("max_ms", "Max", 70),
+        ("rows", "Rows", 70),
+    )
+
+    def __init__(self, master):
+        super().__init__(master)
+        self.title("Performance")
+        self.geometry("900x400")
+
+        toolbar = tk.Frame(self)
+        toolbar.pack(fill="x", pady=5)
+        self.recording = tk.BooleanVar(value=instrumentation.enabled())
+        tk.Checkbutton(toolbar, text="Record timings", variable=self.recording,
+                       command=lambda: instrumentation.enable(self.recording.get())).pack(side="left", padx=3)
+        tk.Button(toolbar, text="Reset", command=self.reset).pack(side="left", padx=3)
+        tk.Button(toolbar, text="Save JSON…", command=self.save).pack(side="left", padx=3)
+
+        self.tree = ttk.Treeview(self, columns=[c[0] for c in self.COLUMNS], show="headings")
+        for column, heading, width in self.COLUMNS:
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=width, anchor="w" if column == "name" else "e")
+        self.tree.pack(fill="both", expand=True, padx=5, pady=5)
+        tk.Label(self, text="Times in milliseconds; percentiles are histogram bucket bounds.",
+                 anchor="w").pack(fill="x", padx=5)
+
+        self._after_id = None
+        self.refresh()
+
+    def refresh(self):
+        self.tree.delete(*self.tree.get_children())
+        stats = instrumentation.stats()
+        for name in sorted(stats, key=lambda n: stats[n]["total_ms"], reverse=True):
+            s = stats[name]
+            self.tree.insert("", "end", values=(
+                name, s["count"], f"{s['total_ms']:.1f}",
+                *(f"{s[key]:.2f}" for key in ("mean_ms", "p50_ms", "p90_ms", "p99_ms", "max_ms")),
+                s["rows"] or "",
+            ))
+        self._after_id = self.after(self.REFRESH_MS, self.refresh)
+
+    def reset(self):
+        instrumentation.reset()
+        self.tree.delete(*self.tree.get_children())
+
+    def save(self):
+        path = filedialog.asksaveasfilename(parent=self, title="Save timings", defaultextension=".json",
+                                            filetypes=[("JSON", "*.json")])
+        if path:
+            instrumentation.dump_json(path)
+            messagebox.showinfo("Saved", f"Timings written to {path}", parent=self)
+
+    def destroy(self):
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+        super().destroy()
@@ -1,212 +1,1494 @@
 """Database access layer for the expense tracker (SQLite + CRUD)."""
 
+import math
+import os
+import re
 import sqlite3
+import threading
+from collections.abc import Iterator
+from dataclasses import dataclass
+from itertools import islice
+from urllib.request import pathname2url
+
+import instrumentation
+from validation import normalize_date
 
 DB_NAME = "expenses.db"
 
+# Connection settings applied to every pooled connection
+JOURNAL_MODE = "WAL"
+SYNCHRONOUS = "NORMAL"
+CACHE_SIZE_KB = 8192
+# Columns of a full expense row, in the order every row-returning method uses
+EXPENSE_COLUMNS = "id, date, category, description, amount, payment_method, user_comments, tags"
+# Rows fetched per page by get_page
+PAGE_SIZE = 200
+# Default number of ranked results returned by search
+SEARCH_LIMIT = 100
+# search ranks only this many of the newest matches, so a common prefix costs no more than a rare one
+SEARCH_CANDIDATES = 1000
+# Shorter search words match whole words only; a one-letter prefix matches most of the table
+MIN_PREFIX_LENGTH = 2
+# Rows handed to executemany at a time by the bulk write methods
+BATCH_SIZE = 1000
+# julianday() of 1970-01-01, the zero of the compact layout's day column
+UNIX_EPOCH_JULIAN_DAY = 2440587.5
+# Temporary view over the hot expenses table and every attached yearly archive
+ARCHIVE_VIEW = "all_expenses"
+# A query plan step that walks the hot table or an archive's expenses table
+_EXPENSES_SCAN = re.compile(r"SCAN (\w+\.)?expenses\b")
+
+
+@dataclass(frozen=True)
+class Storage:
+    """SQL fragments for one on-disk layout of the expenses table.
+
+    The legacy layout stores date TEXT and amount REAL. The compact layout
+    stores day (days since 1970-01-01) and amount_cents as INTEGERs, with
+    date, amount and month as virtual generated columns, so rows read back
+    unchanged while ordering, filtering and sums run on the integers.
+    """
+
+    compact: bool
+    # Columns that order/filter by date and order/sum amounts
+    date_key: str
+    amount_key: str
+    # SQL turning a YYYY-MM-DD or dollar "?" parameter into date_key/amount_key
+    date_param: str
+    amount_param: str
+    # YYYY-MM of a row; {row} is "NEW.", "OLD." or ""
+    month: str
+    # SQL turning a stored total or SUM(amount_key) into dollars; {} is the value
+    dollars: str
+    # Column type of the summary tables' totals
+    total_type: str
+
+
+LEGACY = Storage(
+    compact=False, date_key="date", amount_key="amount", date_param="?", amount_param="?",
+    month="strftime('%Y-%m', {row}date)", dollars="{}", total_type="REAL",
+)
+COMPACT = Storage(
+    compact=True, date_key="day", amount_key="amount_cents",
+    date_param=f"CAST(julianday(?) - {UNIX_EPOCH_JULIAN_DAY} AS INTEGER)",
+    amount_param="CAST(round(? * 100) AS INTEGER)",
+    month="{row}month", dollars="{} / 100.0", total_type="INTEGER",
+)
+
 
+@dataclass(frozen=True)
+class DashboardSnapshot:
+    """Everything the dashboard shows, computed together and shared by every tab."""
+
+    total: float
+    count: int
+    average: float
+    # (category, total, count, average), largest total first
+    categories: tuple
+    # (month, total), newest first
+    monthly: tuple
+    # (date, category, description, amount)
+    top_expenses: tuple
+    recent_expenses: tuple
+    # analytics.Analytics for the same data, attached by analytics.load_dashboard() or the dashboard
+    analytics: object = None
+
+    @property
+    def category_totals(self):
+        """(category, total) pairs, largest total first."""
+        return [(category, total) for category, total, _, _ in self.categories]
+
+    @property
+    def category_counts(self):
+        """(category, count) pairs, most transactions first."""
+        counts = [(category, count) for category, _, count, _ in self.categories]
+        return sorted(counts, key=lambda pair: pair[1], reverse=True)
+
+
+@instrumentation.instrument_methods
 class ExpenseRepository:
-    """Handles all database operations for expenses."""
+    """Handles all database operations for expenses.
+
+    Connections are opened lazily, one per thread, and kept open until
+    close() is called. The repository can also be used as a context manager.
+    Public methods are timed by the instrumentation module when it is enabled.
+
+    Closed years can be moved into read-only per-year archive files with
+    archive_years(). Reads that may reach them ATTACH the archives on demand
+    and go through the ARCHIVE_VIEW union; reads of recent data stay on the
+    hot table.
+    """
 
-    def __init__(self, db_name=DB_NAME):
+    # Read methods that must be served by an index rather than a table scan,
+    # given as a name or a (name, args) pair
+    INDEXED_QUERIES = (
+        "get_all",
+        "get_page",
+        ("get_page", (("9999-12-31", 0),)),
+        ("iter_expenses", ("2024-01-01", "2024-12-31")),
+        ("get_expenses_by_tag", ("food",)),
+        ("get_expenses_by_tags", (["food", "travel"],)),
+        "get_summary_stats",
+        "get_totals_by_category",
+        "get_top_expenses",
+        "get_recent_expenses",
+        "get_monthly_spending",
+        "get_category_counts",
+    )
+
+    def __init__(self, db_name=DB_NAME, journal_mode=JOURNAL_MODE, synchronous=SYNCHRONOUS,
+                 cache_size_kb=CACHE_SIZE_KB):
         self.db_name = db_name
-        self._create_table()
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.cache_size_kb = cache_size_kb
+        self._connections = {}
+        self._lock = threading.Lock()
+        self._fts_available = None
+        # PRAGMA schema_version when storage was detected; see _get_conn()
+        self._schema_version = None
+        # Thread id -> the archives attached to that thread's connection
+        self._attached = {}
+        self._migrate()
+        # _get_conn() detects the layout the migrated schema ended up in
+        self.archives = _load_archives(self._get_conn(), db_name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
 
     def _get_conn(self):
-        return sqlite3.connect(self.db_name)
+        """Return the calling thread's connection, opening it on first use."""
+        thread_id = threading.get_ident()
+        conn = self._connections.get(thread_id)
+        if conn is None:
+            conn = self._open_conn()
+            with self._lock:
+                self._connections[thread_id] = conn
+        # Transactions are only begun on a connection returned here, so an open one was checked already
+        if not conn.in_transaction:
+            self._check_layout(conn)
+        return conn
+
+    @instrumentation.timed("ExpenseRepository.layout_check")
+    def _check_layout(self, conn):
+        """Detect the layout again if the schema has changed since it was last detected.
+
+        A running app thus keeps working after migrate_db.py --compact swaps
+        the table underneath it.
+        """
+        schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        if schema_version != self._schema_version:
+            self.storage = _detect_storage(conn)
+            self._fts_available = None
+            self._schema_version = schema_version
+
+    @instrumentation.timed("ExpenseRepository.open_conn")
+    def _open_conn(self):
+        # Each connection is only used by the thread that opened it, but close()
+        # may run on another thread, so the same-thread check is disabled.
+        # uri=True makes the archives' "file:...?mode=ro" ATTACHes work whatever SQLITE_USE_URI the build has
+        conn = sqlite3.connect(_file_uri(self.db_name), uri=True, check_same_thread=False)
+        conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        # A negative cache_size is interpreted by SQLite as KiB rather than pages
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kb)}")
+        return conn
+
+    def close(self):
+        """Close every pooled connection. The repository reopens them on demand."""
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+            self._attached.clear()
+        for conn in connections:
+            conn.close()
+
+    def _migrate(self):
+        """Bring the schema up to SCHEMA_VERSION, running only the steps that are behind.
 
-    def _create_table(self):
+        Each step takes the write lock before reading user_version, so when
+        two processes open an old database at once the second waits for the
+        first's step and then skips it instead of running it again.
+        """
+        conn = self._get_conn()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                if conn.execute("PRAGMA user_version").fetchone()[0] < target:
+                    migration(conn)
+                    conn.execute(f"PRAGMA user_version = {target}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    # CRUD operations
+    def get_all(self):
         with self._get_conn() as conn:
             cur = conn.cursor()
+            table = self._spanning(conn)
+            select, extra = _with_sort_keys(table, EXPENSE_COLUMNS, self.storage.date_key, "id")
+            cur.execute(f"SELECT {select} FROM {table} ORDER BY {self.storage.date_key} DESC, id DESC")
+            return _strip(cur.fetchall(), extra)
+
+    def get_page(self, after=None, limit=PAGE_SIZE):
+        """Return up to limit rows in get_all() order, starting after the (date, id) key given.
+
+        Uses keyset pagination on the (date DESC, id DESC) index, so every page
+        costs the same regardless of how deep into the history it is.
+        """
+        return self._newest(EXPENSE_COLUMNS, 1, after, limit)
+
+    def _newest(self, columns, date_index, after, limit):
+        """Keyset query for the newest rows; the archives are only read once the hot table runs out."""
+        with self._get_conn() as conn:
+            return self._newest_rows(conn, columns, date_index, after, limit)
+
+    def _newest_rows(self, conn, columns, date_index, after, limit):
+        """_newest() on conn, leaving any open transaction open."""
+        rows = self._newest_from(conn, "expenses", columns, after, limit)
+        # Every archived row is older than _hot_start, so a full page that
+        # ends on or after it cannot be missing any archived row
+        if self.archives and (len(rows) < limit or rows[-1][date_index] < self._hot_start):
+            rows = self._newest_from(conn, self._spanning(conn), columns, after, limit)
+        return rows
+
+    def _newest_from(self, conn, table, columns, after, limit):
+        date_key = self.storage.date_key
+        select, extra = _with_sort_keys(table, columns, date_key, "id")
+        cur = conn.cursor()
+        if after is None:
+            cur.execute(f"SELECT {select} FROM {table} ORDER BY {date_key} DESC, id DESC LIMIT ?", (limit,))
+        else:
             cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS expenses (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    date TEXT NOT NULL,
-                    category TEXT NOT NULL,
-                    description TEXT,
-                    amount REAL NOT NULL,
-                    payment_method TEXT,
-                    user_comments TEXT,
-                    tags TEXT
-                )
-                """
+                f"SELECT {select} FROM {table} "
+                f"WHERE ({date_key}, id) < ({self.storage.date_param}, ?) "
+                f"ORDER BY {date_key} DESC, id DESC LIMIT ?",
+                (*after, limit),
             )
-            conn.commit()
-            # Ensure new columns exist (for backward compatibility)
-            self._ensure_columns_exist(conn)
+        return _strip(cur.fetchall(), extra)
 
-    # CRUD operations
-    def get_all(self):
+    def get_by_id(self, expense_id):
+        """Return the full row for an expense, or None if it does not exist."""
         with self._get_conn() as conn:
             cur = conn.cursor()
-            # Check which columns exist to be backward compatible
-            cur.execute("PRAGMA table_info(expenses)")
-            columns = [column[1] for column in cur.fetchall()]
+            cur.execute(f"SELECT {EXPENSE_COLUMNS} FROM expenses WHERE id = ?", (expense_id,))
+            row = cur.fetchone()
+            if row is None and self.archives:
+                cur.execute(f"SELECT {EXPENSE_COLUMNS} FROM {self._spanning(conn)} WHERE id = ?", (expense_id,))
+                row = cur.fetchone()
+            return row
 
-            # Build query based on available columns
-            if 'user_comments' in columns and 'tags' in columns:
-                cur.execute(
-                    "SELECT id, date, category, description, amount, payment_method, user_comments, tags "
-                    "FROM expenses ORDER BY date DESC, id DESC"
-                )
-                results = cur.fetchall()
-            else:
-                # Fallback for older databases
-                cur.execute(
-                    "SELECT id, date, category, description, amount, payment_method "
-                    "FROM expenses ORDER BY date DESC, id DESC"
-                )
-                results = [row + (None, None) for row in cur.fetchall()]  # Add None for missing columns
+    def iter_expenses(self, start=None, end=None, category=None, chunk_size=BATCH_SIZE,
+                      columns=EXPENSE_COLUMNS):
+        """Yield lists of up to chunk_size rows, oldest first, with fetchmany.
 
-            return results
+        start and end are inclusive YYYY-MM-DD bounds and category an exact
+        match; each is skipped when None. columns is the SELECT list (full
+        rows by default). Only one chunk is in memory at a time, and the
+        single SELECT reads one consistent snapshot. Archives are only read
+        when start is missing or falls in an archived year.
+        """
+        date_key, date_param = self.storage.date_key, self.storage.date_param
+        clauses, params = [], []
+        if start is not None:
+            clauses.append(f"{date_key} >= {date_param}")
+            params.append(start)
+        if end is not None:
+            clauses.append(f"{date_key} <= {date_param}")
+            params.append(end)
+        if category is not None:
+            clauses.append("category = ?")
+            params.append(category)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        conn = self._get_conn()
+        table = "expenses"
+        if self.archives and (start is None or start < self._hot_start):
+            table = self._spanning(conn)
+        select, extra = _with_sort_keys(table, columns, date_key, "id")
+        cur = conn.cursor()
+        try:
+            cur.execute(f"SELECT {select} FROM {table} {where}ORDER BY {date_key}, id", params)
+            while rows := cur.fetchmany(chunk_size):
+                yield _strip(rows, extra)
+        finally:
+            cur.close()
 
     def insert(self, date, category, description, amount, payment_method, user_comments=None, tags=None):
+        """Insert an expense and return its full row."""
         with self._get_conn() as conn:
             cur = conn.cursor()
-            # Ensure columns exist before inserting
-            self._ensure_columns_exist(conn)
-
-            cur.execute(
-                """
-                INSERT INTO expenses (date, category, description, amount, payment_method, user_comments, tags)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                (date, category, description, amount, payment_method, user_comments, tags),
-            )
+            cur.execute(self._insert_sql(), (date, category, description, amount, payment_method, user_comments, tags))
+            expense_id = cur.lastrowid
+            _write_tags(cur, [(expense_id, tags)])
             conn.commit()
+            return self._stored_row(cur, (expense_id, date, category, description, amount, payment_method,
+                                          user_comments, tags))
 
     def update(self, expense_id, date, category, description, amount, payment_method, user_comments=None, tags=None):
+        """Update an expense and return its new row, or None if it does not exist.
+
+        Raises ValueError for an archived expense.
+        """
         with self._get_conn() as conn:
             cur = conn.cursor()
-            # Ensure columns exist before updating
-            self._ensure_columns_exist(conn)
-
             cur.execute(
-                """
-                UPDATE expenses
-                SET date = ?, category = ?, description = ?, amount = ?, payment_method = ?, user_comments = ?, tags = ?
-                WHERE id = ?
-                """,
+                self._update_sql(),
                 (date, category, description, amount, payment_method, user_comments, tags, expense_id),
             )
+            if cur.rowcount == 0:
+                conn.commit()
+                self._check_not_archived(conn, expense_id)
+                return None
+            _write_tags(cur, [(expense_id, tags)])
             conn.commit()
+            return self._stored_row(cur, (expense_id, date, category, description, amount, payment_method,
+                                          user_comments, tags))
+
+    def _insert_sql(self):
+        storage = self.storage
+        return f"""
+            INSERT INTO expenses
+                ({storage.date_key}, category, description, {storage.amount_key}, payment_method, user_comments, tags)
+            VALUES ({storage.date_param}, ?, ?, {storage.amount_param}, ?, ?, ?)
+        """
+
+    def _update_sql(self):
+        storage = self.storage
+        return f"""
+            UPDATE expenses
+            SET {storage.date_key} = {storage.date_param}, category = ?, description = ?,
+                {storage.amount_key} = {storage.amount_param}, payment_method = ?, user_comments = ?, tags = ?
+            WHERE id = ?
+        """
+
+    def _stored_row(self, cur, row):
+        """Return row as it reads back; the compact layout rounds the amount to the cent."""
+        if not self.storage.compact:
+            return row
+        cur.execute(f"SELECT {EXPENSE_COLUMNS} FROM expenses WHERE id = ?", (row[0],))
+        return cur.fetchone()
 
     def delete(self, expense_id):
+        """Delete an expense and return the row that was removed, or None if it did not exist.
+
+        Raises ValueError for an archived expense.
+        """
         with self._get_conn() as conn:
             cur = conn.cursor()
+            cur.execute(f"SELECT {EXPENSE_COLUMNS} FROM expenses WHERE id = ?", (expense_id,))
+            row = cur.fetchone()
+            if row is None:
+                self._check_not_archived(conn, expense_id)
             cur.execute("DELETE FROM expenses WHERE id = ?", (expense_id,))
+            cur.execute("DELETE FROM expense_tags WHERE expense_id = ?", (expense_id,))
             conn.commit()
+            return row
+
+    def _check_not_archived(self, conn, expense_id):
+        if self.archives and conn.execute(
+                f"SELECT 1 FROM {self._spanning(conn)} WHERE id = ?", (expense_id,)).fetchone():
+            raise ValueError(f"Expense {expense_id} is in a read-only yearly archive")
+
+    def get_existing_keys(self, keys):
+        """Return the subset of (date, amount, description) keys that already exist.
+
+        Amounts are compared to the cent and a missing description equals "".
+        Each key is a seek on the amount index, checked against the date, so
+        the cost follows the number of keys rather than the table. Archives
+        are only searched for the years the keys fall in.
+        """
+        wanted = {(date, round(amount, 2), description or "") for date, amount, description in keys}
+        storage = self.storage
+        if storage.compact:
+            amount_match = f"e.amount_cents = {storage.amount_param.replace('?', 'k.amount')}"
+        else:
+            amount_match = "e.amount BETWEEN k.amount - 0.005 AND k.amount + 0.005"
+        found = set()
+        with self._get_conn() as conn:
+            cur = conn.cursor()
+            years = {str(date)[:4] for date, _, _ in wanted}
+            schemas = ["main"] + [schema for schema, year in self._archive_schemas(conn) if str(year) in years]
+            for schema in schemas:
+                # Two parameters per key, kept under SQLite's default limit of 999
+                for batch in batched({key[:2] for key in wanted}, 499):
+                    values = ", ".join("(?, ?)" for _ in batch)
+                    # The unary + keeps the planner off the date index, where one
+                    # busy day would mean reading hundreds of rows per key
+                    cur.execute(
+                        f"""
+                        WITH k(date, amount) AS (VALUES {values})
+                        SELECT e.date, e.amount, IFNULL(e.description, '')
+                        FROM k CROSS JOIN {schema}.expenses e
+                        WHERE {amount_match}
+                          AND +e.{storage.date_key} = {storage.date_param.replace('?', 'k.date')}
+                        """,
+                        [param for key in batch for param in key],
+                    )
+                    found.update((date, round(amount, 2), description) for date, amount, description in cur)
+        return found & wanted
+
+    # Bulk operations (one transaction per call, executemany per batch)
+    def insert_many(self, rows, batch_size=BATCH_SIZE):
+        """Insert (date, category, description, amount, payment_method[, user_comments[, tags]]) rows.
+
+        Returns the new expense ids in input order.
+        """
+        new_ids = []
+        with self._get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            for batch in batched((_pad_row(row, 7) for row in rows), batch_size):
+                cur.executemany(self._insert_sql(), batch)
+                # AUTOINCREMENT ids are contiguous while this transaction holds the write lock
+                cur.execute("SELECT seq FROM sqlite_sequence WHERE name = 'expenses'")
+                last_id = cur.fetchone()[0]
+                batch_ids = range(last_id - len(batch) + 1, last_id + 1)
+                _write_tags(cur, [(expense_id, row[6]) for expense_id, row in zip(batch_ids, batch)])
+                new_ids.extend(batch_ids)
+        return new_ids
 
-    # Dashboard queries
+    def update_many(self, rows, batch_size=BATCH_SIZE):
+        """Update (expense_id, date, category, description, amount, payment_method[, user_comments[, tags]]) rows.
+
+        Returns the number of rows changed; ids that do not exist are skipped,
+        as update() skips them. Raises ValueError, changing nothing, if any
+        row is an archived expense.
+        """
+        changed = 0
+        with self._get_conn() as conn:
+            # ATTACH cannot run inside the write transaction
+            self._spanning(conn)
+            cur = conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            update_sql = self._update_sql()
+            for batch in batched((_pad_row(row, 8) for row in rows), batch_size):
+                updated = []
+                for row in batch:
+                    cur.execute(update_sql, (*row[1:], row[0]))
+                    if cur.rowcount:
+                        updated.append((row[0], row[7]))
+                    else:
+                        self._check_not_archived(conn, row[0])
+                changed += len(updated)
+                # Tags only for the rows that exist, or they would be counted for no expense
+                _write_tags(cur, updated)
+        return changed
+
+    def delete_many(self, expense_ids, batch_size=BATCH_SIZE):
+        """Delete expenses by id. Returns the number of rows removed.
+
+        Ids that do not exist are skipped, as delete() skips them. Raises
+        ValueError, deleting nothing, if any id is an archived expense.
+        """
+        removed = 0
+        with self._get_conn() as conn:
+            # ATTACH cannot run inside the write transaction
+            self._spanning(conn)
+            cur = conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            for batch in batched(((expense_id,) for expense_id in expense_ids), batch_size):
+                for params in batch:
+                    cur.execute("DELETE FROM expenses WHERE id = ?", params)
+                    if cur.rowcount:
+                        removed += 1
+                    else:
+                        self._check_not_archived(conn, params[0])
+                cur.executemany("DELETE FROM expense_tags WHERE expense_id = ?", batch)
+        return removed
+
+    # Dashboard queries (served from the trigger-maintained summary tables)
     def get_summary_stats(self):
         with self._get_conn() as conn:
             cur = conn.cursor()
-            cur.execute("SELECT SUM(amount), COUNT(*), AVG(amount) FROM expenses")
-            total, count, avg = cur.fetchone()
-            return total or 0.0, count or 0, avg or 0.0
+            cur.execute(f"SELECT {self._total}, count FROM global_totals WHERE id = 1")
+            total, count = cur.fetchone()
+            return total, count, total / count if count else 0.0
 
     def get_totals_by_category(self):
         with self._get_conn() as conn:
             cur = conn.cursor()
-            cur.execute(
-                """
-                SELECT category, SUM(amount)
-                FROM expenses
-                GROUP BY category
-                ORDER BY SUM(amount) DESC
-                """
-            )
+            cur.execute(f"SELECT category, {self._total} FROM category_totals ORDER BY total DESC")
             return cur.fetchall()
 
     def get_top_expenses(self, limit=5):
         with self._get_conn() as conn:
-            cur = conn.cursor()
-            cur.execute(
-                """
-                SELECT date, category, description, amount
-                FROM expenses
-                ORDER BY amount DESC
-                LIMIT ?
-                """,
-                (limit,),
-            )
-            return cur.fetchall()
+            return self._top_expenses(conn, limit)
+
+    def _top_expenses(self, conn, limit):
+        """get_top_expenses() on conn, leaving any open transaction open."""
+        cur = conn.cursor()
+        table = self._spanning(conn)
+        select, extra = _with_sort_keys(table, "date, category, description, amount", self.storage.amount_key)
+        cur.execute(
+            f"""
+            SELECT {select}
+            FROM {table}
+            ORDER BY {self.storage.amount_key} DESC
+            LIMIT ?
+            """,
+            (limit,),
+        )
+        return _strip(cur.fetchall(), extra)
 
     def get_recent_expenses(self, limit=15):
         """Get recent expenses ordered chronologically (most recent first)."""
+        return self._newest("date, category, description, amount", 0, None, limit)
+
+    def get_monthly_spending(self):
         with self._get_conn() as conn:
             cur = conn.cursor()
-            cur.execute(
-                """
-                SELECT date, category, description, amount
-                FROM expenses
-                ORDER BY date DESC, id DESC
-                LIMIT ?
-                """,
-                (limit,),
-            )
+            cur.execute(f"SELECT month, {self._total} FROM monthly_totals ORDER BY month DESC LIMIT 12")
             return cur.fetchall()
 
-    def _ensure_columns_exist(self, conn):
-        """Ensure that user_comments and tags columns exist (for backward compatibility)."""
-        cursor = conn.cursor()
-        try:
-            # Check current schema
-            cursor.execute("PRAGMA table_info(expenses)")
-            columns = [column[1] for column in cursor.fetchall()]
+    def get_category_counts(self):
+        with self._get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT category, count FROM category_totals ORDER BY count DESC")
+            return cur.fetchall()
 
-            # Add missing columns if needed
-            if 'user_comments' not in columns:
-                cursor.execute("ALTER TABLE expenses ADD COLUMN user_comments TEXT")
-                print("Added user_comments column")
+    def get_dashboard_snapshot(self, top_limit=5, recent_limit=15, months=12):
+        """Read every dashboard aggregate in one read transaction.
 
-            if 'tags' not in columns:
-                cursor.execute("ALTER TABLE expenses ADD COLUMN tags TEXT")
-                print("Added tags column")
+        Totals come from the summary tables, so the cost depends on the number
+        of categories and months rather than the number of expenses.
+        """
+        with self._get_conn() as conn:
+            # ATTACH cannot run inside the read transaction
+            self._spanning(conn)
+            cur = conn.cursor()
+            cur.execute("BEGIN")
+            cur.execute(f"SELECT {self._total}, count FROM global_totals WHERE id = 1")
+            total, count = cur.fetchone()
+            cur.execute(f"SELECT category, {self._total}, count FROM category_totals ORDER BY total DESC")
+            categories = [(category, cat_total, cat_count, cat_total / cat_count)
+                          for category, cat_total, cat_count in cur.fetchall()]
+            cur.execute(f"SELECT month, {self._total} FROM monthly_totals ORDER BY month DESC LIMIT ?", (months,))
+            monthly = cur.fetchall()
+            # The public getters would commit on leaving their own "with conn" block
+            top_expenses = self._top_expenses(conn, top_limit)
+            recent_expenses = self._newest_rows(conn, "date, category, description, amount", 0, None, recent_limit)
 
-            conn.commit()
-        except sqlite3.Error as e:
-            print(f"Error ensuring columns exist: {e}")
-            conn.rollback()
+        return DashboardSnapshot(
+            total=total,
+            count=count,
+            average=total / count if count else 0.0,
+            categories=tuple(categories),
+            monthly=tuple(monthly),
+            top_expenses=tuple(top_expenses),
+            recent_expenses=tuple(recent_expenses),
+        )
 
-    def get_monthly_spending(self):
+    @property
+    def _total(self):
+        """A summary table's total column in dollars."""
+        return self.storage.dollars.format("total")
+
+    # Summary table maintenance
+    def rebuild_summaries(self):
+        """Recompute the summary tables from the expenses table and the archived totals."""
+        with self._get_conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            _rebuild_summaries(conn, self.storage)
+
+    def verify_summaries(self):
+        """Compare the summary tables with a fresh aggregation of the expenses table and archived totals.
+
+        Returns a list of (table, key, stored, expected) mismatches; stored or
+        expected is None when a row is missing on that side.
+        """
         with self._get_conn() as conn:
             cur = conn.cursor()
-            cur.execute(
-                """
-                SELECT strftime('%Y-%m', date) as month, SUM(amount) as total
-                FROM expenses
-                GROUP BY month
-                ORDER BY month DESC
-                LIMIT 12
+            cur.execute("BEGIN")
+            mismatches = []
+            for table, (key_column, expected_sql) in _summary_sources(conn, self.storage).items():
+                stored_sql = f"SELECT {key_column}, total, count FROM {table}"
+                stored = {key: (total, count) for key, total, count in cur.execute(stored_sql).fetchall()}
+                expected = {key: (total, count) for key, total, count in cur.execute(expected_sql).fetchall()}
+                for key in stored.keys() | expected.keys():
+                    have, want = stored.get(key), expected.get(key)
+                    if have is None or want is None or have[1] != want[1] or \
+                            not math.isclose(have[0], want[0], rel_tol=1e-9, abs_tol=0.005):
+                        mismatches.append((table, key, have, want))
+        return mismatches
+
+    # Tag queries (served from the expense_tags index)
+    def get_expenses_by_tag(self, tag):
+        return self.get_expenses_by_tags([tag])
+
+    def get_expenses_by_tags(self, tags, match_all=True):
+        """Expenses carrying every tag (match_all) or any of the tags, newest first.
+
+        Tags match whole, case-insensitively: "food" does not match "seafood".
+        """
+        wanted = sorted(split_tags(",".join(tags)))
+        if not wanted:
+            return []
+        placeholders = ", ".join("?" * len(wanted))
+        having = "HAVING COUNT(*) = ?" if match_all else ""
+        params = wanted + [len(wanted)] if match_all else wanted
+        with self._get_conn() as conn:
+            cur = conn.cursor()
+            # Each archive keeps its own expense_tags, so match per partition
+            schemas = ["main"] + [schema for schema, _ in self._archive_schemas(conn)]
+            partitions = " UNION ALL ".join(
+                f"""
+                SELECT * FROM {schema}.expenses
+                WHERE id IN (
+                    SELECT expense_id FROM {schema}.expense_tags
+                    WHERE tag IN ({placeholders})
+                    GROUP BY expense_id {having}
+                )
                 """
+                for schema in schemas
+            )
+            cur.execute(
+                f"""
+                SELECT date, category, description, amount, user_comments
+                FROM ({partitions})
+                ORDER BY {self.storage.date_key} DESC, id DESC
+                """,
+                params * len(schemas),
             )
             return cur.fetchall()
 
-    def get_category_counts(self):
+    def get_tag_totals(self):
+        """Return (tag, total, count) for every tag, largest total first.
+
+        Archived years come from archived_tag_totals without opening the archives.
+        """
         with self._get_conn() as conn:
             cur = conn.cursor()
             cur.execute(
-                """
-                SELECT category, COUNT(*) as count
-                FROM expenses
-                GROUP BY category
-                ORDER BY count DESC
+                f"""
+                SELECT tag, {self.storage.dollars.format("SUM(total)")}, SUM(count)
+                FROM (
+                    SELECT t.tag AS tag, SUM(e.{self.storage.amount_key}) AS total, COUNT(*) AS count
+                    FROM expense_tags t
+                    JOIN expenses e ON e.id = t.expense_id
+                    GROUP BY t.tag
+                    UNION ALL
+                    SELECT tag, total, count FROM archived_tag_totals
+                )
+                GROUP BY tag
+                ORDER BY SUM(total) DESC
                 """
             )
             return cur.fetchall()
 
-    def get_expenses_by_tag(self, tag):
+    def get_value_counts(self):
+        """Return {field: [(value, count), ...]} for category, payment_method, description and tags.
+
+        Feeds the expense form's autocomplete; empty values are left out.
+        """
+        counts = {}
         with self._get_conn() as conn:
             cur = conn.cursor()
+            table = self._spanning(conn)
+            for column in ("category", "payment_method", "description"):
+                cur.execute(f"SELECT {column}, COUNT(*) FROM {table} WHERE {column} != '' GROUP BY {column}")
+                counts[column] = cur.fetchall()
             cur.execute(
                 """
-                SELECT date, category, description, amount, user_comments
-                FROM expenses
-                WHERE tags LIKE ?
-                ORDER BY date DESC
-                """,
-                (f'%{tag}%',)
+                SELECT tag, SUM(count)
+                FROM (
+                    SELECT tag, COUNT(*) AS count FROM expense_tags GROUP BY tag
+                    UNION ALL
+                    SELECT tag, count FROM archived_tag_totals
+                )
+                GROUP BY tag
+                """
             )
+            counts["tags"] = cur.fetchall()
+        return counts
+
+    # Full-text search
+    def search(self, query, limit=SEARCH_LIMIT, offset=0):
+        """Return full rows whose description, comments or tags match every word of query.
+
+        Each word of MIN_PREFIX_LENGTH or more characters matches as a prefix
+        ("gro" finds "groceries"), shorter ones as whole words. The newest
+        SEARCH_CANDIDATES matches (or offset + limit, if more) are ranked by
+        relevance, the hot table's matches first and then each archived
+        year's, newest first; archives are only searched when the hot table
+        has too few matches. Falls back to a LIKE scan if SQLite lacks FTS5.
+        """
+        words = query.split()
+        if not words:
+            return []
+        with self._get_conn() as conn:
+            cur = conn.cursor()
+            if self._has_fts(conn):
+                match = " ".join('"{}"{}'.format(word.replace('"', '""'), "*" * (len(word) >= MIN_PREFIX_LENGTH))
+                                 for word in words)
+                rows = self._search_partition(cur, "main", match, offset + limit)
+                if len(rows) < offset + limit:
+                    for schema, _ in self._archive_schemas(conn):
+                        rows += self._search_partition(cur, schema, match, offset + limit - len(rows))
+                        if len(rows) >= offset + limit:
+                            break
+                return rows[offset:]
+            else:
+                text = "IFNULL(description, '') || ' ' || IFNULL(user_comments, '') || ' ' || IFNULL(tags, '')"
+                where = " AND ".join(f"{text} LIKE ?" for _ in words)
+                cur.execute(
+                    f"SELECT {EXPENSE_COLUMNS} FROM {self._spanning(conn)} WHERE {where} "
+                    f"ORDER BY {self.storage.date_key} DESC, id DESC LIMIT ? OFFSET ?",
+                    (*(f"%{word}%" for word in words), limit, offset),
+                )
             return cur.fetchall()
+
+    def _search_partition(self, cur, schema, match, limit):
+        # Ranking every match would score them all before the LIMIT; walking
+        # rowids newest first stops after the candidates
+        cur.execute(
+            f"""
+            SELECT {", ".join("e." + column for column in EXPENSE_COLUMNS.split(", "))}
+            FROM (
+                SELECT rowid, bm25(expenses_fts) AS score
+                FROM {schema}.expenses_fts
+                WHERE expenses_fts MATCH ?
+                ORDER BY rowid DESC
+                LIMIT ?
+            ) f
+            JOIN {schema}.expenses e ON e.id = f.rowid
+            ORDER BY f.score, f.rowid DESC
+            LIMIT ?
+            """,
+            (match, max(limit, SEARCH_CANDIDATES), limit),
+        )
+        return cur.fetchall()
+
+    def _has_fts(self, conn):
+        if self._fts_available is None:
+            cur = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'expenses_fts'")
+            self._fts_available = cur.fetchone() is not None
+        return self._fts_available
+
+    # Storage layout
+    def convert_to_compact(self):
+        """Rebuild the expenses table in the COMPACT layout in one transaction.
+
+        Returns False if it already is compact. Other repositories with the
+        database open pick up the new layout on their next call. Dates such
+        as 2024-1-5 are rewritten as YYYY-MM-DD on the way. Raises ValueError
+        once years have been archived, since the archives keep the layout
+        they were written in, or if some dates cannot be read at all.
+        """
+        if self.storage.compact:
+            return False
+        if self.archives:
+            raise ValueError("Years have already been archived in the legacy layout; convert before archiving")
+        with self._get_conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            _convert_to_compact(conn)
+        self.storage = COMPACT
+        return True
+
+    # Yearly archives
+    def archive_years(self, through_year, progress=None):
+        """Move every expense dated in through_year or earlier into per-year archive files.
+
+        Each year goes to archive_path(db_name, year), next to the database,
+        appending to an existing archive. Its totals are pre-aggregated into
+        archived_totals and archived_tag_totals, so the summary tables and
+        tag totals keep covering the whole history. Rows whose date SQLite
+        cannot parse stay in the hot table. progress(year, rows) is called
+        after each year. Returns {year: rows moved}.
+
+        Each year is copied and committed to its archive before it is deleted
+        from the hot table, so an interrupted run leaves rows in both places
+        and can simply be re-run. Run it with the app closed: other processes
+        keep reading the hot table alone until they reopen the database.
+
+        Reads attach every archive at once, so raises ValueError, before
+        moving anything, if that would take more archives than SQLite can
+        attach (10 by default).
+        """
+        storage = self.storage
+        conn = self._get_conn()
+        cur = conn.execute(
+            f"SELECT DISTINCT CAST(strftime('%Y', date) AS INTEGER) FROM expenses "
+            f"WHERE {storage.date_key} < {storage.date_param}",
+            (f"{through_year + 1}-01-01",),
+        )
+        years = sorted(year for year, in cur.fetchall() if year is not None)
+        archived = sorted({year for year, _ in self.archives} | set(years))
+        limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        if len(archived) > limit:
+            raise ValueError(
+                f"Archiving through {through_year} would need {len(archived)} yearly archives, but SQLite can "
+                f"only attach {limit}; archive through {archived[limit - 1]} at most"
+            )
+        self._detach_archives(conn)
+        moved = {}
+        for year in years:
+            moved[year] = _archive_year(conn, storage, year, archive_path(self.db_name, year), self._has_fts(conn))
+            if progress:
+                progress(year, moved[year])
+        self.archives = _load_archives(conn, self.db_name)
+        return moved
+
+    @property
+    def _hot_start(self):
+        """The first date after the newest archived year; every archived row is older."""
+        return f"{self.archives[-1][0] + 1}-01-01"
+
+    def _spanning(self, conn):
+        """Return the table for reads that may reach archived years, attaching the archives if needed."""
+        if not self.archives:
+            return "expenses"
+        self._archive_schemas(conn)
+        return ARCHIVE_VIEW
+
+    def _archive_schemas(self, conn):
+        """ATTACH the archives read-only on conn if needed; return (schema, year) pairs, newest first.
+
+        ATTACH cannot run inside a transaction, and SQLite allows 10 attached
+        databases by default, which archive_years() keeps the number of
+        archived years under. If any ATTACH fails, the ones before it are
+        detached again so the connection is left as it was.
+        """
+        thread_id = threading.get_ident()
+        if self._attached.get(thread_id, ()) != self.archives:
+            self._detach_archives(conn)
+            attached = []
+            try:
+                for year, path in self.archives:
+                    uri = _file_uri(path, mode="ro")
+                    conn.execute(f"ATTACH DATABASE ? AS archive_{year}", (uri,))
+                    attached.append(year)
+                if self.archives:
+                    partitions = ["SELECT * FROM main.expenses"]
+                    partitions += [f"SELECT * FROM archive_{year}.expenses" for year, _ in self.archives]
+                    conn.execute(f"CREATE TEMP VIEW {ARCHIVE_VIEW} AS {' UNION ALL '.join(partitions)}")
+            except sqlite3.Error:
+                for year in attached:
+                    conn.execute(f"DETACH DATABASE archive_{year}")
+                raise
+            self._attached[thread_id] = self.archives
+        return [(f"archive_{year}", year) for year, _ in reversed(self.archives)]
+
+    def _detach_archives(self, conn):
+        conn.execute(f"DROP VIEW IF EXISTS temp.{ARCHIVE_VIEW}")
+        for year, _ in self._attached.pop(threading.get_ident(), ()):
+            conn.execute(f"DETACH DATABASE archive_{year}")
+
+    # Change detection
+    def get_data_version(self):
+        """Return PRAGMA data_version for the calling thread's connection.
+
+        The value changes whenever another connection (another thread's or
+        another process's) commits to the database.
+        """
+        return self._get_conn().execute("PRAGMA data_version").fetchone()[0]
+
+    # Query plan checks
+    def explain_query_plans(self):
+        """Return {query label: [(sql, [plan detail, ...]), ...]} for INDEXED_QUERIES."""
+        conn = self._get_conn()
+        plans = {}
+        for query in self.INDEXED_QUERIES:
+            name, args = (query, ()) if isinstance(query, str) else query
+            label = f"{name}{args!r}" if args else name
+            statements = []
+            conn.set_trace_callback(statements.append)
+            try:
+                result = getattr(self, name)(*args)
+                if isinstance(result, Iterator):
+                    # Generators only run their query once consumed
+                    for _ in result:
+                        pass
+            finally:
+                conn.set_trace_callback(None)
+            plans[label] = [
+                (sql, [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)])
+                for sql in statements
+                if sql.lstrip().upper().startswith("SELECT")
+            ]
+        return plans
+
+    def find_full_scans(self):
+        """Return (method name, plan detail) pairs for queries that scan or sort the whole table.
+
+        Sorting the handful of rows produced by a GROUP BY, an index seek or a
+        small summary table is allowed; sorting a scan of expenses is not.
+        """
+        problems = []
+        for name, statements in self.explain_query_plans().items():
+            for sql, details in statements:
+                grouped = "GROUP BY" in sql.upper()
+                scans_expenses = any(_EXPENSES_SCAN.match(detail) for detail in details)
+                for detail in details:
+                    if _EXPENSES_SCAN.match(detail) and "INDEX" not in detail:
+                        problems.append((name, detail))
+                    elif "TEMP B-TREE FOR GROUP BY" in detail and scans_expenses:
+                        problems.append((name, detail))
+                    elif "TEMP B-TREE FOR ORDER BY" in detail and scans_expenses and not grouped:
+                        problems.append((name, detail))
+        return problems
+
+
+def batched(iterable, size):
+    """Yield lists of up to size items without materializing the whole iterable."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def split_tags(tags):
+    """Normalize a comma-separated tags string into a set of lowercase tags."""
+    if not tags:
+        return set()
+    return {tag.strip().lower() for tag in tags.split(",") if tag.strip()}
+
+
+def _write_tags(cur, expense_tags):
+    """Replace the expense_tags rows for each (expense_id, tags string) pair."""
+    cur.executemany("DELETE FROM expense_tags WHERE expense_id = ?",
+                    [(expense_id,) for expense_id, _ in expense_tags])
+    cur.executemany(
+        "INSERT INTO expense_tags (expense_id, tag) VALUES (?, ?)",
+        [(expense_id, tag) for expense_id, tags in expense_tags for tag in split_tags(tags)],
+    )
+
+
+def _with_sort_keys(table, columns, *keys):
+    """Return (select list, number of added columns) for a query over table ordered by keys.
+
+    SQLite only merges the partitions' indexes for an ORDER BY over the
+    ARCHIVE_VIEW union when the ORDER BY columns are selected, so they are
+    appended there and removed again with _strip().
+    """
+    if table != ARCHIVE_VIEW:
+        return columns, 0
+    return f"{columns}, {', '.join(keys)}", len(keys)
+
+
+def _strip(rows, extra):
+    """Drop the trailing columns added by _with_sort_keys()."""
+    return [row[:-extra] for row in rows] if extra else rows
+
+
+def _pad_row(row, length):
+    """Pad a row tuple with None for its trailing optional columns."""
+    return tuple(row) + (None,) * (length - len(row))
+
+
+# Schema migrations, applied in order. Migration N brings the database to
+# PRAGMA user_version N and runs inside a single transaction.
+def _migrate_v1(conn):
+    """Create the expenses table and add the user_comments/tags columns to older databases."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS expenses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            category TEXT NOT NULL,
+            description TEXT,
+            amount REAL NOT NULL,
+            payment_method TEXT,
+            user_comments TEXT,
+            tags TEXT
+        )
+        """
+    )
+    columns = [column[1] for column in conn.execute("PRAGMA table_info(expenses)")]
+    if 'user_comments' not in columns:
+        conn.execute("ALTER TABLE expenses ADD COLUMN user_comments TEXT")
+        print("Added user_comments column")
+    if 'tags' not in columns:
+        conn.execute("ALTER TABLE expenses ADD COLUMN tags TEXT")
+        print("Added tags column")
+
+
+def _migrate_v2(conn):
+    """Add indexes that cover the repository's list, top-N and dashboard queries."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_expenses_date_id ON expenses (date DESC, id DESC)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_expenses_amount ON expenses (amount DESC)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_expenses_category_amount ON expenses (category, amount)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_expenses_month_amount "
+        "ON expenses (strftime('%Y-%m', date), amount)"
+    )
+
+
+def _migrate_v3(conn):
+    """Index (category, month, amount) so the dashboard snapshot groups without sorting."""
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_expenses_category_month "
+        "ON expenses (category, strftime('%Y-%m', date), amount)"
+    )
+
+
+def _migrate_v4(conn):
+    """Add summary tables kept current by triggers, replacing the snapshot's grouping index."""
+    for statement in _summary_schema(LEGACY):
+        conn.execute(statement)
+    conn.execute("DROP INDEX IF EXISTS idx_expenses_category_month")
+    _rebuild_summaries(conn)
+
+
+def _summary_schema(storage):
+    """Return the summary table and trigger statements for a storage layout."""
+    return [
+        statement.format(
+            amount=storage.amount_key,
+            date=storage.date_key,
+            total_type=storage.total_type,
+            new_month=storage.month.format(row="NEW."),
+            old_month=storage.month.format(row="OLD."),
+        )
+        for statement in _SUMMARY_SCHEMA
+    ]
+
+
+# Per-category, per-month and overall totals. Each trigger subtracts the old
+# row and/or adds the new one, dropping category and month rows that empty out.
+# A row whose month is NULL (a date SQLite cannot read) is refused, since it
+# could never be subtracted again. Placeholders are filled in by _summary_schema().
+_SUMMARY_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS category_totals (
+        category TEXT PRIMARY KEY,
+        total {total_type} NOT NULL,
+        count INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS monthly_totals (
+        month TEXT PRIMARY KEY,
+        total {total_type} NOT NULL,
+        count INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS global_totals (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total {total_type} NOT NULL,
+        count INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS expenses_summary_insert AFTER INSERT ON expenses
+    BEGIN
+        SELECT RAISE(ABORT, 'expense date must be YYYY-MM-DD') WHERE {new_month} IS NULL;
+        INSERT INTO category_totals (category, total, count) VALUES (NEW.category, NEW.{amount}, 1)
+            ON CONFLICT (category) DO UPDATE SET total = total + excluded.total, count = count + 1;
+        INSERT INTO monthly_totals (month, total, count) VALUES ({new_month}, NEW.{amount}, 1)
+            ON CONFLICT (month) DO UPDATE SET total = total + excluded.total, count = count + 1;
+        UPDATE global_totals SET total = total + NEW.{amount}, count = count + 1 WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS expenses_summary_delete AFTER DELETE ON expenses
+    BEGIN
+        UPDATE category_totals SET total = total - OLD.{amount}, count = count - 1 WHERE category = OLD.category;
+        DELETE FROM category_totals WHERE category = OLD.category AND count = 0;
+        UPDATE monthly_totals SET total = total - OLD.{amount}, count = count - 1
+            WHERE month = {old_month};
+        DELETE FROM monthly_totals WHERE month = {old_month} AND count = 0;
+        UPDATE global_totals SET total = CASE WHEN count = 1 THEN 0 ELSE total - OLD.{amount} END,
+            count = count - 1 WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS expenses_summary_update AFTER UPDATE OF {date}, category, {amount} ON expenses
+    BEGIN
+        SELECT RAISE(ABORT, 'expense date must be YYYY-MM-DD') WHERE {new_month} IS NULL;
+        UPDATE category_totals SET total = total - OLD.{amount}, count = count - 1 WHERE category = OLD.category;
+        DELETE FROM category_totals WHERE category = OLD.category AND count = 0;
+        UPDATE monthly_totals SET total = total - OLD.{amount}, count = count - 1
+            WHERE month = {old_month};
+        DELETE FROM monthly_totals WHERE month = {old_month} AND count = 0;
+        INSERT INTO category_totals (category, total, count) VALUES (NEW.category, NEW.{amount}, 1)
+            ON CONFLICT (category) DO UPDATE SET total = total + excluded.total, count = count + 1;
+        INSERT INTO monthly_totals (month, total, count) VALUES ({new_month}, NEW.{amount}, 1)
+            ON CONFLICT (month) DO UPDATE SET total = total + excluded.total, count = count + 1;
+        UPDATE global_totals SET total = total - OLD.{amount} + NEW.{amount} WHERE id = 1;
+    END
+    """,
+]
+
+
+def _summary_sources(conn, storage):
+    """Return {summary table: (key column, SELECT of key, total, count)} from a fresh aggregation.
+
+    Covers the expenses table plus, once migration 7 has run, the years
+    pre-aggregated in archived_totals.
+    """
+    amount, month = storage.amount_key, storage.month.format(row="")
+    sources = {
+        "category_totals": ("category", f"SELECT category, SUM({amount}), COUNT(*) FROM expenses GROUP BY category"),
+        "monthly_totals": ("month", f"SELECT {month} AS month, SUM({amount}), COUNT(*) FROM expenses GROUP BY month"),
+        "global_totals": ("id", f"SELECT 1, IFNULL(SUM({amount}), 0), COUNT(*) FROM expenses"),
+    }
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'archived_totals'").fetchone():
+        return sources
+    archived = {"category_totals": "category", "monthly_totals": "month", "global_totals": "1"}
+    return {
+        table: (key, f"WITH live (key, total, count) AS ({select} UNION ALL "
+                     f"SELECT {archived[table]}, total, count FROM archived_totals) "
+                     f"SELECT key, SUM(total), SUM(count) FROM live GROUP BY key")
+        for table, (key, select) in sources.items()
+    }
+
+
+def _rebuild_summaries(conn, storage=LEGACY):
+    """Repopulate the summary tables; the caller owns the transaction."""
+    for table, (key, select) in _summary_sources(conn, storage).items():
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(f"INSERT INTO {table} ({key}, total, count) {select}")
+
+
+def _normalize_dates(conn):
+    """Rewrite legacy dates SQLite cannot read, such as 2024-1-5, as YYYY-MM-DD; the caller owns the transaction.
+
+    Returns the number of rows rewritten, after rebuilding the summary
+    tables if there were any, since the triggers filed those rows under a
+    NULL month. Raises ValueError, changing nothing, if some dates cannot
+    be read at all.
+    """
+    rewrites, unreadable = [], []
+    for expense_id, date in conn.execute("SELECT id, date FROM expenses WHERE julianday(date) IS NULL").fetchall():
+        try:
+            rewrites.append((normalize_date(str(date)), expense_id))
+        except ValueError:
+            unreadable.append(date)
+    if unreadable:
+        raise ValueError(f"{len(unreadable)} expenses have a date that is not YYYY-MM-DD "
+                         f"(such as {unreadable[0]!r}); fix them first")
+    if rewrites:
+        conn.executemany("UPDATE expenses SET date = ? WHERE id = ?", rewrites)
+        _rebuild_summaries(conn)
+    return len(rewrites)
+
+
+# Shared by the hot database and the yearly archives; {schema} is "" or "archive."
+_EXPENSE_TAGS_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS {schema}expense_tags (
+        expense_id INTEGER NOT NULL,
+        tag TEXT NOT NULL,
+        PRIMARY KEY (tag, expense_id)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS {schema}idx_expense_tags_expense ON expense_tags (expense_id)",
+]
+_FTS_TABLE = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS {schema}expenses_fts USING fts5(
+        description, user_comments, tags,
+        content='expenses', content_rowid='id', prefix='2 3'
+    )
+"""
+
+
+def _migrate_v5(conn):
+    """Split the comma-separated tags column into an indexed expense_tags table."""
+    for statement in _EXPENSE_TAGS_SCHEMA:
+        conn.execute(statement.format(schema=""))
+    cur = conn.execute("SELECT id, tags FROM expenses WHERE tags IS NOT NULL AND tags != ''")
+    for batch in batched(cur, BATCH_SIZE):
+        conn.executemany(
+            "INSERT OR IGNORE INTO expense_tags (expense_id, tag) VALUES (?, ?)",
+            [(expense_id, tag) for expense_id, tags in batch for tag in split_tags(tags)],
+        )
+
+
+def _migrate_v6(conn):
+    """Mirror description, user_comments and tags into an FTS5 index kept in sync by triggers.
+
+    Skipped when SQLite was built without FTS5; search() then falls back to LIKE.
+    """
+    try:
+        conn.execute(_FTS_TABLE.format(schema=""))
+    except sqlite3.OperationalError as e:
+        print(f"Full-text search unavailable: {e}")
+        return
+    _create_fts_triggers(conn)
+    conn.execute("INSERT INTO expenses_fts (expenses_fts) VALUES ('rebuild')")
+
+
+def _create_fts_triggers(conn):
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS expenses_fts_insert AFTER INSERT ON expenses
+        BEGIN
+            INSERT INTO expenses_fts (rowid, description, user_comments, tags)
+            VALUES (NEW.id, NEW.description, NEW.user_comments, NEW.tags);
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS expenses_fts_delete AFTER DELETE ON expenses
+        BEGIN
+            INSERT INTO expenses_fts (expenses_fts, rowid, description, user_comments, tags)
+            VALUES ('delete', OLD.id, OLD.description, OLD.user_comments, OLD.tags);
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS expenses_fts_update AFTER UPDATE OF description, user_comments, tags ON expenses
+        BEGIN
+            INSERT INTO expenses_fts (expenses_fts, rowid, description, user_comments, tags)
+            VALUES ('delete', OLD.id, OLD.description, OLD.user_comments, OLD.tags);
+            INSERT INTO expenses_fts (rowid, description, user_comments, tags)
+            VALUES (NEW.id, NEW.description, NEW.user_comments, NEW.tags);
+        END
+        """
+    )
+
+
+def _migrate_v7(conn):
+    """Add the registry of yearly archive files and their pre-aggregated totals.
+
+    Totals are NUMERIC so they hold dollars or integer cents, whichever
+    layout the archived years were written in.
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS archives (
+            year INTEGER PRIMARY KEY,
+            file TEXT NOT NULL,
+            count INTEGER NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS archived_totals (
+            year INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            month TEXT NOT NULL,
+            total NUMERIC NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (year, category, month)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS archived_tag_totals (
+            year INTEGER NOT NULL,
+            tag TEXT NOT NULL,
+            total NUMERIC NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (year, tag)
+        )
+        """
+    )
+
+
+def _migrate_v8(conn):
+    """Drop the monthly grouping index left behind by v4; monthly_totals replaced it."""
+    conn.execute("DROP INDEX IF EXISTS idx_expenses_month_amount")
+
+
+def _migrate_v9(conn):
+    """Rewrite unpadded dates such as 2024-1-5 and recreate the summary triggers so they refuse them.
+
+    Those dates have no month, so they were added to monthly_totals under
+    NULL and never subtracted again; the summaries are rebuilt to drop them.
+    """
+    storage = _detect_storage(conn)
+    if not storage.compact:
+        _normalize_dates(conn)
+    for trigger in ("expenses_summary_insert", "expenses_summary_delete", "expenses_summary_update"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    for statement in _summary_schema(storage):
+        conn.execute(statement)
+    _rebuild_summaries(conn, storage)
+
+
+MIGRATIONS = [
+    _migrate_v1,
+    _migrate_v2,
+    _migrate_v3,
+    _migrate_v4,
+    _migrate_v5,
+    _migrate_v6,
+    _migrate_v7,
+    _migrate_v8,
+    _migrate_v9,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+# The compact layout. It is not a numbered migration: ExpenseRepository.convert_to_compact()
+# rebuilds the table on request, and later migrations must work with either layout.
+_COMPACT_TABLE = """
+    CREATE TABLE expenses_compact (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        day INTEGER NOT NULL,
+        category TEXT NOT NULL,
+        description TEXT,
+        amount_cents INTEGER NOT NULL,
+        payment_method TEXT,
+        user_comments TEXT,
+        tags TEXT,
+        date TEXT GENERATED ALWAYS AS (date(day * 86400, 'unixepoch')) VIRTUAL,
+        amount REAL GENERATED ALWAYS AS (amount_cents / 100.0) VIRTUAL,
+        month TEXT GENERATED ALWAYS AS (strftime('%Y-%m', day * 86400, 'unixepoch')) VIRTUAL
+    )
+"""
+
+_COMPACT_INDEXES = [
+    "CREATE INDEX idx_expenses_day_id ON expenses (day DESC, id DESC)",
+    "CREATE INDEX idx_expenses_amount_cents ON expenses (amount_cents DESC)",
+    "CREATE INDEX idx_expenses_category_amount ON expenses (category, amount_cents)",
+]
+
+
+def _detect_storage(conn):
+    columns = {column[1] for column in conn.execute("PRAGMA table_info(expenses)")}
+    return COMPACT if "amount_cents" in columns else LEGACY
+
+
+# The compact columns filled from a legacy row, and their values; {row} is "NEW." or ""
+_COMPACT_COLUMNS = "id, day, category, description, amount_cents, payment_method, user_comments, tags"
+_COMPACT_VALUES = (
+    f"{{row}}id, {COMPACT.date_param.replace('?', '{row}date')}, {{row}}category, {{row}}description, "
+    f"{COMPACT.amount_param.replace('?', '{row}amount')}, {{row}}payment_method, {{row}}user_comments, {{row}}tags"
+)
+
+
+def _convert_to_compact(conn):
+    """Rebuild a legacy expenses table in the compact layout; the caller owns the transaction.
+
+    Ids, tags and the FTS index carry over unchanged. The summary tables are
+    recreated with integer-cent totals. Unpadded dates are normalized first,
+    since the day column cannot hold them; see _normalize_dates().
+    """
+    _normalize_dates(conn)
+    sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'expenses'").fetchone()
+
+    conn.execute(_COMPACT_TABLE)
+    conn.execute(
+        f"INSERT INTO expenses_compact ({_COMPACT_COLUMNS}) SELECT {_COMPACT_VALUES.format(row='')} FROM expenses"
+    )
+    # Dropping the table also drops its indexes and triggers
+    conn.execute("DROP TABLE expenses")
+    conn.execute("ALTER TABLE expenses_compact RENAME TO expenses")
+    if sequence:
+        # Keep ids of deleted rows from being handed out again
+        conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'expenses'", sequence)
+    _finish_compact(conn)
+
+
+def _finish_compact(conn):
+    """Recreate the indexes, summary tables and FTS triggers of a freshly swapped-in compact table."""
+    for statement in _COMPACT_INDEXES:
+        conn.execute(statement)
+    for table in ("category_totals", "monthly_totals", "global_totals"):
+        conn.execute(f"DROP TABLE {table}")
+    for statement in _summary_schema(COMPACT):
+        conn.execute(statement)
+    _rebuild_summaries(conn, COMPACT)
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'expenses_fts'").fetchone():
+        _create_fts_triggers(conn)
+
+
+# Yearly archives. Each archive file holds one year's expenses in the same
+# layout as the hot table, with its own date/amount indexes, expense_tags and
+# (when available) FTS index; the hot database keeps the registry and totals.
+def _file_uri(path, mode=None):
+    """Return a file: URI for path, escaped for a connection opened with uri=True."""
+    uri = "file:" + pathname2url(os.path.abspath(path))
+    return f"{uri}?mode={mode}" if mode else uri
+
+
+def archive_path(db_name, year):
+    """Return the archive file for year that sits next to db_name, e.g. expenses-2023.db."""
+    stem, ext = os.path.splitext(db_name)
+    return f"{stem}-{year}{ext}"
+
+
+def _load_archives(conn, db_name):
+    """Return ((year, path), ...) for the registered archives, oldest first."""
+    directory = os.path.dirname(os.path.abspath(db_name))
+    cur = conn.execute("SELECT year, file FROM archives ORDER BY year")
+    return tuple((year, os.path.join(directory, file)) for year, file in cur.fetchall())
+
+
+def _archive_year(conn, storage, year, path, fts):
+    """Move one year of expenses from the hot table into the archive at path; returns the rows moved."""
+    month = storage.month.format(row="")
+    where = (f"{storage.date_key} >= {storage.date_param} AND {storage.date_key} < {storage.date_param} "
+             f"AND {month} IS NOT NULL")
+    bounds = (f"{year}-01-01", f"{year + 1}-01-01")
+    columns = (f"id, {storage.date_key}, category, description, {storage.amount_key}, "
+               "payment_method, user_comments, tags")
+    table_sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'expenses'").fetchone()[0]
+
+    conn.execute("ATTACH DATABASE ? AS archive", (_file_uri(path),))
+    try:
+        # Readers open archives with mode=ro, which a WAL file would not allow
+        conn.execute("PRAGMA archive.journal_mode = DELETE")
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            _create_archive_schema(conn, storage, table_sql, fts)
+            conn.execute(
+                f"INSERT OR REPLACE INTO archive.expenses ({columns}) "
+                f"SELECT {columns} FROM main.expenses WHERE {where}",
+                bounds,
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO archive.expense_tags (expense_id, tag) "
+                f"SELECT expense_id, tag FROM main.expense_tags WHERE expense_id IN "
+                f"(SELECT id FROM main.expenses WHERE {where})",
+                bounds,
+            )
+            if fts:
+                conn.execute("INSERT INTO archive.expenses_fts (expenses_fts) VALUES ('rebuild')")
+
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM main.archived_totals WHERE year = ?", (year,))
+            conn.execute(
+                "INSERT INTO main.archived_totals (year, category, month, total, count) "
+                f"SELECT ?, category, {month}, SUM({storage.amount_key}), COUNT(*) FROM archive.expenses "
+                "GROUP BY 2, 3",
+                (year,),
+            )
+            conn.execute("DELETE FROM main.archived_tag_totals WHERE year = ?", (year,))
+            conn.execute(
+                "INSERT INTO main.archived_tag_totals (year, tag, total, count) "
+                f"SELECT ?, t.tag, SUM(e.{storage.amount_key}), COUNT(*) "
+                "FROM archive.expense_tags t JOIN archive.expenses e ON e.id = t.expense_id GROUP BY t.tag",
+                (year,),
+            )
+            conn.execute(
+                f"DELETE FROM main.expense_tags WHERE expense_id IN (SELECT id FROM main.expenses WHERE {where})",
+                bounds,
+            )
+            moved = conn.execute(f"DELETE FROM main.expenses WHERE {where}", bounds).rowcount
+            count = conn.execute("SELECT COUNT(*) FROM archive.expenses").fetchone()[0]
+            conn.execute("INSERT OR REPLACE INTO main.archives (year, file, count) VALUES (?, ?, ?)",
+                         (year, os.path.basename(path), count))
+            # The delete triggers took the year out of the summary tables; put
+            # it back from archived_totals
+            _rebuild_summaries(conn, storage)
+    finally:
+        conn.execute("DETACH DATABASE archive")
+    return moved
+
+
+def _create_archive_schema(conn, storage, table_sql, fts):
+    """Create the attached archive's tables and indexes if it is new."""
+    # Same definition as the hot table, so the two union column for column
+    conn.execute(re.sub(r'^CREATE TABLE\s+(IF NOT EXISTS\s+)?"?expenses"?',
+                        "CREATE TABLE IF NOT EXISTS archive.expenses", table_sql, flags=re.IGNORECASE))
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS archive.idx_expenses_date_id ON expenses ({storage.date_key} DESC, id DESC)"
+    )
+    conn.execute(f"CREATE INDEX IF NOT EXISTS archive.idx_expenses_amount ON expenses ({storage.amount_key} DESC)")
+    for statement in _EXPENSE_TAGS_SCHEMA:
+        conn.execute(statement.format(schema="archive."))
+    if fts:
+        conn.execute(_FTS_TABLE.format(schema="archive."))
@@ -0,0 +1,19 @@
+"""Shared fixtures; the modules under test live at the repository root."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from repository import ExpenseRepository  # noqa: E402
+
+
+@pytest.fixture(params=["legacy", "compact"])
+def repo(request, tmp_path):
+    """An empty repository in each storage layout."""
+    with ExpenseRepository(str(tmp_path / "expenses.db")) as repo:
+        if request.param == "compact":
+            repo.convert_to_compact()
+        yield repo
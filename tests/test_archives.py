@@ -0,0 +1,92 @@
+"""Archived years stay readable but refuse every write."""
+
+import os
+import sqlite3
+
+import pytest
+
+import check_archives
+from repository import ExpenseRepository, archive_path
+
+
+@pytest.fixture
+def archived(repo):
+    """repo with 2022 and 2023 archived and 2024 still hot; returns (repo, old ids, hot ids)."""
+    old = repo.insert_many([("2022-03-01", "Food", "old", 10.0, "Cash", None, "food"),
+                            ("2022-12-31", "Rent", "old", 500.0, "Cash"),
+                            ("2023-02-28", "Food", "old", 12.5, "Card", None, "food")])
+    hot = repo.insert_many([("2024-01-01", "Food", "hot", 20.0, "Cash", None, "food"),
+                            ("2024-02-29", "Travel", "hot", 99.99, "Card")])
+    assert repo.archive_years(2023) == {2022: 2, 2023: 1}
+    return repo, old, hot
+
+
+def snapshot(repo):
+    return repo.get_all(), repo.get_monthly_spending(), repo.get_summary_stats(), repo.get_expenses_by_tag("food")
+
+
+def test_reads_span_the_archives(archived):
+    repo, old, hot = archived
+    assert [year for year, _ in repo.archives] == [2022, 2023]
+    assert all(os.path.exists(archive_path(repo.db_name, year)) for year in (2022, 2023))
+    assert sorted(row[0] for row in repo.get_all()) == sorted(old + hot)
+    assert repo.get_by_id(old[0])[1:5] == ("2022-03-01", "Food", "old", 10.0)
+    assert len(repo.get_expenses_by_tag("food")) == 3
+    assert repo.get_summary_stats()[1] == 5
+    assert repo.verify_summaries() == []
+
+
+@pytest.mark.parametrize("write", [
+    lambda repo, ids: repo.update(ids[0], "2022-03-02", "Food", "edited", 1.0, "Cash"),
+    lambda repo, ids: repo.delete(ids[1]),
+    lambda repo, ids: repo.update_many([(ids[2], "2023-03-01", "Food", "edited", 1.0, "Cash")]),
+    lambda repo, ids: repo.delete_many([ids[0]]),
+], ids=["update", "delete", "update_many", "delete_many"])
+def test_archived_rows_refuse_writes(archived, write):
+    repo, old, hot = archived
+    before = snapshot(repo)
+    with pytest.raises(ValueError, match="read-only"):
+        write(repo, old)
+    assert snapshot(repo) == before
+    assert repo.verify_summaries() == []
+
+
+def test_bulk_writes_change_nothing_when_one_id_is_archived(archived):
+    repo, old, hot = archived
+    before = snapshot(repo)
+    with pytest.raises(ValueError):
+        repo.update_many([(hot[0], "2024-01-02", "Food", "edited", 1.0, "Cash"),
+                          (old[0], "2022-03-02", "Food", "edited", 1.0, "Cash")])
+    with pytest.raises(ValueError):
+        repo.delete_many([hot[0], hot[1], old[2]])
+    assert snapshot(repo) == before
+
+    assert repo.delete_many(hot + [12345]) == 2
+    assert repo.verify_summaries() == []
+
+
+def test_archive_files_are_attached_read_only(archived):
+    repo, old, hot = archived
+    conn = repo._get_conn()
+    repo.get_all()
+    for statement in ("DELETE FROM archive_2022.expenses",
+                      "UPDATE archive_2023.expenses SET description = 'edited'",
+                      "CREATE TABLE archive_2022.scratch (id INTEGER)"):
+        with pytest.raises(sqlite3.OperationalError, match="readonly"):
+            conn.execute(statement)
+    conn.rollback()
+    assert len(repo.get_all()) == len(old + hot)
+
+
+def test_archives_reopen(archived):
+    repo, old, hot = archived
+    expected = repo.get_all()
+    repo.close()
+    with ExpenseRepository(repo.db_name) as reopened:
+        assert reopened.get_all() == expected
+        with pytest.raises(ValueError):
+            reopened.delete(old[0])
+
+
+def test_attach_limit(tmp_path):
+    assert check_archives.run_checks(str(tmp_path / "expenses.db")) == []
@@ -0,0 +1,110 @@
+"""Converting to the compact layout, in one transaction or as a resumable shadow-table copy."""
+
+import sqlite3
+
+import pytest
+
+import migrate_db
+from repository import ExpenseRepository
+
+ROWS = 1200
+
+
+@pytest.fixture
+def legacy(tmp_path):
+    path = str(tmp_path / "expenses.db")
+    with ExpenseRepository(path) as repo:
+        repo.insert_many([(f"20{20 + n % 5}-{n % 12 + 1:02d}-{n % 28 + 1:02d}", ["Food", "Rent", "Travel"][n % 3],
+                           f"item {n}", n % 500 + 0.25 * (n % 4), "Cash", None, "food" if n % 2 else None)
+                          for n in range(ROWS)])
+        yield repo
+
+
+def shadow_run(repo, **kwargs):
+    return migrate_db.run_shadow_migration(migrate_db.compact_migration(), repo.db_name, chunk_size=250, **kwargs)
+
+
+def test_interrupted_shadow_swap_resumes(legacy):
+    first = shadow_run(legacy, max_chunks=2)
+    assert not first.swapped
+    assert (first.done, first.total) == (500, ROWS)
+
+    # The app keeps writing on both sides of the copy
+    new_id = legacy.insert("2024-02-29", "Food", "leap day", 12.34, "Card", "note", "food")[0]
+    legacy.update(10, "2023-12-31", "Travel", "copied, then moved", 99.99, "Cash", None, "trip")
+    legacy.update(1000, "2024-01-01", "Rent", "not copied yet", 800.0, "Cash")
+    legacy.delete(20)
+    legacy.delete_many([1100, 1101])
+    assert not shadow_run(legacy, max_chunks=1).swapped
+
+    expected = legacy.get_all()
+    tagged = legacy.get_expenses_by_tag("food")
+    result = shadow_run(legacy)
+    assert result.swapped
+    assert result.resumed_from == 750
+
+    # The repository opened before the swap switches layout on its next call
+    assert legacy.get_all() == expected
+    assert legacy.storage.compact
+    assert legacy.get_expenses_by_tag("food") == tagged
+    assert legacy.verify_summaries() == []
+    assert legacy.insert("2025-01-01", "Food", "after", 1.0, "Cash")[0] > new_id
+    assert legacy.verify_summaries() == []
+
+    conn = legacy._get_conn()
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'expenses_compact'").fetchone() is None
+    assert conn.execute("SELECT COUNT(*) FROM migration_progress").fetchone()[0] == 0
+
+
+def test_shadow_swap_matches_one_transaction(legacy, tmp_path):
+    source, copy = sqlite3.connect(legacy.db_name), sqlite3.connect(str(tmp_path / "oneshot.db"))
+    source.backup(copy)
+    source.close()
+    copy.close()
+    other = ExpenseRepository(str(tmp_path / "oneshot.db"))
+    other.convert_to_compact()
+
+    assert shadow_run(legacy).swapped
+    assert legacy.get_all() == other.get_all()
+    assert legacy.get_dashboard_snapshot() == other.get_dashboard_snapshot()
+    other.close()
+
+
+def _add_raw(repo, dates):
+    """Write dates the summary triggers would refuse, as older versions stored them."""
+    conn = sqlite3.connect(repo.db_name)
+    conn.execute("DROP TRIGGER expenses_summary_insert")
+    conn.executemany(
+        "INSERT INTO expenses (date, category, description, amount, payment_method) VALUES (?, 'Food', '', 5.0, '')",
+        [(date,) for date in dates],
+    )
+    conn.commit()
+    conn.close()
+
+
+@pytest.mark.parametrize("convert", ["one transaction", "shadow"])
+def test_conversion_normalizes_dates(legacy, convert):
+    _add_raw(legacy, ["2024-1-5", "2024-02-9"])
+    if convert == "shadow":
+        assert shadow_run(legacy).swapped
+    else:
+        legacy.convert_to_compact()
+
+    dates = [row[1] for row in legacy.get_all()]
+    assert legacy.storage.compact
+    assert len(dates) == ROWS + 2
+    assert {"2024-01-05", "2024-02-09"} <= set(dates)
+    assert legacy.verify_summaries() == []
+
+
+@pytest.mark.parametrize("convert", ["one transaction", "shadow"])
+def test_conversion_refuses_unreadable_dates(legacy, convert):
+    _add_raw(legacy, ["someday"])
+    with pytest.raises(ValueError, match="someday"):
+        if convert == "shadow":
+            shadow_run(legacy)
+        else:
+            legacy.convert_to_compact()
+
+    assert len(legacy.get_all()) == ROWS + 1
+    assert not legacy.storage.compact
@@ -0,0 +1,113 @@
+"""Upgrading old databases through every step of MIGRATIONS."""
+
+import multiprocessing
+import sqlite3
+
+import pytest
+
+import create_old_db
+from repository import SCHEMA_VERSION, ExpenseRepository
+
+
+def columns(conn, table):
+    return [name for _, name, *_ in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def test_v1_database_upgrades(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    create_old_db.create_old_style_database()
+
+    with ExpenseRepository("expenses.db") as repo:
+        conn = repo._get_conn()
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        assert {"user_comments", "tags"} <= set(columns(conn, "expenses"))
+        assert conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'idx_expenses_month_amount'").fetchone() is None
+        assert repo.get_all() == [(1, "2024-11-25", "Food", "Lunch at restaurant", 25.5, "Credit Card", None, None)]
+        assert repo.verify_summaries() == []
+        assert repo.get_monthly_spending() == [("2024-11", 25.5)]
+
+        new_id = repo.insert("2024-12-01", "Food", "Dinner", 30.0, "Cash", None, "food")[0]
+        assert repo.get_by_id(new_id)[3] == "Dinner"
+        assert len(repo.get_expenses_by_tag("food")) == 1
+        assert repo.verify_summaries() == []
+
+
+def test_reopening_is_a_no_op(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    create_old_db.create_old_style_database()
+    ExpenseRepository("expenses.db").close()
+    with ExpenseRepository("expenses.db") as repo:
+        assert len(repo.get_all()) == 1
+        assert repo.verify_summaries() == []
+
+
+def _make_v8_with_unpadded_dates(path, dates):
+    """A v8 database whose summary triggers still accept dates such as 2024-1-5."""
+    ExpenseRepository(path).close()
+    conn = sqlite3.connect(path)
+    conn.execute("DROP TRIGGER expenses_summary_insert")
+    conn.executemany(
+        "INSERT INTO expenses (date, category, description, amount, payment_method) VALUES (?, 'Food', '', 5.0, '')",
+        [(date,) for date in dates],
+    )
+    # What the v8 insert trigger did with a date that has no month
+    conn.execute("INSERT INTO monthly_totals (month, total, count) VALUES (NULL, ?, ?)", (5.0 * len(dates), len(dates)))
+    conn.execute("PRAGMA user_version = 8")
+    conn.commit()
+    conn.close()
+
+
+def test_v9_normalizes_unpadded_dates(tmp_path):
+    path = str(tmp_path / "expenses.db")
+    _make_v8_with_unpadded_dates(path, ["2024-1-5", "2024-02-29", "2023-12-9"])
+
+    with ExpenseRepository(path) as repo:
+        assert sorted(row[1] for row in repo.get_all()) == ["2023-12-09", "2024-01-05", "2024-02-29"]
+        assert repo.verify_summaries() == []
+        assert dict(repo.get_monthly_spending()) == {"2024-02": 5.0, "2024-01": 5.0, "2023-12": 5.0}
+        with pytest.raises(sqlite3.IntegrityError):
+            repo.insert("2024-1-5", "Food", "", 5.0, "")
+
+
+def test_v9_refuses_unreadable_dates(tmp_path):
+    path = str(tmp_path / "expenses.db")
+    _make_v8_with_unpadded_dates(path, ["2024-01-05", "sometime"])
+
+    with pytest.raises(ValueError, match="sometime"):
+        ExpenseRepository(path)
+    # The failed step rolled back, so it runs again once the date is fixed
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 8
+    conn.execute("UPDATE expenses SET date = '2024-01-06' WHERE date = 'sometime'")
+    conn.commit()
+    conn.close()
+    with ExpenseRepository(path) as repo:
+        assert repo.verify_summaries() == []
+
+
+def _open(path, results):
+    try:
+        ExpenseRepository(path).close()
+        results.put(None)
+    except Exception as e:  # reported to the parent process
+        results.put(repr(e))
+
+
+def test_concurrent_first_opens_migrate_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    create_old_db.create_old_style_database()
+    path = str(tmp_path / "expenses.db")
+
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    processes = [context.Process(target=_open, args=(path, results)) for _ in range(8)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+    assert [results.get(timeout=5) for _ in processes] == [None] * len(processes)
+
+    with ExpenseRepository(path) as repo:
+        assert len(repo.get_all()) == 1
+        assert repo.verify_summaries() == []
@@ -0,0 +1,83 @@
+"""The summary triggers must keep category_totals, monthly_totals and global_totals exact."""
+
+import sqlite3
+from collections import defaultdict
+
+import pytest
+
+from validation import validate_expense
+
+EDGE_DATES = ["2024-02-29", "2023-12-31", "2024-01-01", "2024-01-31", "2000-02-29"]
+
+
+def add(repo, date, category="Food", amount=10.0, tags=None):
+    return repo.insert(date, category, "test", amount, "Cash", None, tags)[0]
+
+
+def expected_months(repo):
+    months = defaultdict(float)
+    for row in repo.get_all():
+        months[row[1][:7]] += row[4]
+    return months
+
+
+def assert_consistent(repo):
+    assert repo.verify_summaries() == []
+    stored = dict(repo.get_monthly_spending())
+    assert None not in stored
+    for month, total in expected_months(repo).items():
+        assert stored[month] == pytest.approx(total, abs=0.005)
+
+
+def test_single_row_writes(repo):
+    ids = [add(repo, date, category, amount) for date, category, amount in
+           zip(EDGE_DATES, ["Food", "Rent", "Travel", "Food", "Rent"], [12.5, 800.0, 0.1, 99.99, 3.0])]
+    assert_consistent(repo)
+
+    # Month, category and amount all change at once
+    repo.update(ids[0], "2024-03-01", "Travel", "moved", 13.25, "Cash")
+    repo.update(ids[1], "2024-01-01", "Rent", "year boundary", 800.0, "Cash")
+    repo.delete(ids[2])
+    assert_consistent(repo)
+    assert "2023-12" not in dict(repo.get_monthly_spending())
+
+
+def test_bulk_writes(repo):
+    ids = repo.insert_many([(f"2024-0{month}-0{day}", "Food", "bulk", month + day / 100, "Cash", None, "food")
+                            for month in range(1, 4) for day in range(1, 8)])
+    assert_consistent(repo)
+
+    repo.update_many([(expense_id, "2024-12-31", "Rent", "moved", 1.5, "Cash") for expense_id in ids[::3]])
+    repo.delete_many(ids[1::3])
+    assert_consistent(repo)
+
+    repo.delete_many(ids)
+    assert repo.verify_summaries() == []
+    assert repo.get_monthly_spending() == []
+    assert repo.get_category_counts() == []
+
+
+@pytest.mark.parametrize("date", ["2024-1-5", " 2024-01-05 ", "2024-01-5"])
+def test_validation_pads_dates(repo, date):
+    date, amount = validate_expense(date, "Food", "4.20")
+    assert date == "2024-01-05"
+    expense_id = add(repo, date, amount=amount)
+    assert_consistent(repo)
+    repo.delete(expense_id)
+    assert repo.get_monthly_spending() == []
+
+
+@pytest.mark.parametrize("date", ["2024-1-5", "05/01/2024", ""])
+def test_triggers_refuse_unreadable_dates(repo, date):
+    expense_id = add(repo, "2024-01-05")
+    before = repo.get_monthly_spending()
+
+    with pytest.raises(sqlite3.IntegrityError):
+        add(repo, date)
+    with pytest.raises(sqlite3.IntegrityError):
+        repo.update(expense_id, date, "Food", "test", 10.0, "Cash")
+
+    assert repo.get_by_id(expense_id)[1] == "2024-01-05"
+    assert len(repo.get_all()) == 1
+    assert repo.get_monthly_spending() == before
+    assert_consistent(repo)
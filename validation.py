@@ -0,0 +1,35 @@
+"""Validation rules shared by the expense form and the importers."""
+
+from datetime import datetime
+
+DATE_FORMAT = "%Y-%m-%d"
+
+
+def normalize_date(date):
+    """Return date as zero-padded YYYY-MM-DD, the only form SQLite's date functions read.
+
+    Accepts whatever strptime reads with DATE_FORMAT, such as 2024-1-5.
+    Raises ValueError otherwise.
+    """
+    try:
+        return datetime.strptime(date.strip(), DATE_FORMAT).date().isoformat()
+    except ValueError:
+        raise ValueError("Invalid date format.") from None
+
+
+def validate_expense(date, category, amount_str):
+    """Check the required fields of an expense and return (date, amount).
+
+    The date is normalized to YYYY-MM-DD and the amount is a float; store
+    these rather than the raw input. Raises ValueError with a user-facing
+    message when a rule fails.
+    """
+    if not date or not category or not amount_str:
+        raise ValueError("Date, category, and amount are required.")
+
+    try:
+        amount = float(amount_str)
+    except ValueError:
+        raise ValueError("Amount must be numeric.") from None
+
+    return normalize_date(date), amount